@@ -0,0 +1,267 @@
+"""Progress analytics (stats, calendar heatmaps and trend lines)"""
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy import case, func, literal, union_all
+from sqlalchemy.orm import Session
+
+from app.database import Progress, ProgressSummary
+from app.schemas import ProgressStats
+
+BUCKETS = ("day", "week", "month")
+
+
+# ============================================================================
+# COLUMN LOADING
+# ============================================================================
+
+def load_practice_columns(db: Session, user_id: int, start: date) -> Dict[str, np.ndarray]:
+    """
+    Load raw practice columns for a user as NumPy arrays.
+
+    Only the three columns needed for bucketing are selected (served from
+    the covering index on progress), so no ORM objects are built and the
+    database truncates timestamps to calendar days.
+    """
+    rows = db.query(
+        func.date(Progress.practice_date),
+        func.coalesce(Progress.completion_time, 0),
+        func.coalesce(Progress.is_completed, False)
+    ).filter(
+        (Progress.user_id == user_id) &
+        (Progress.practice_date >= datetime.combine(start, datetime.min.time()))
+    ).all()
+
+    if not rows:
+        return empty_columns()
+
+    dates, seconds, completed = zip(*rows)
+    return {
+        "dates": np.array(dates, dtype="datetime64[D]"),
+        "sessions": np.ones(len(rows), dtype=np.int64),
+        "completed": np.array(completed, dtype=np.int64),
+        "seconds": np.array(seconds, dtype=np.int64),
+    }
+
+
+def load_summary_columns(db: Session, user_id: int, start: date) -> Dict[str, np.ndarray]:
+    """Load compacted daily summaries for a user as weighted column arrays"""
+    rows = db.query(
+        ProgressSummary.summary_date,
+        ProgressSummary.session_count,
+        ProgressSummary.completed_count,
+        ProgressSummary.total_time
+    ).filter(
+        (ProgressSummary.user_id == user_id) &
+        (ProgressSummary.summary_date >= start)
+    ).all()
+
+    if not rows:
+        return empty_columns()
+
+    dates, sessions, completed, seconds = zip(*rows)
+    return {
+        "dates": np.array(dates, dtype="datetime64[D]"),
+        "sessions": np.array(sessions, dtype=np.int64),
+        "completed": np.array(completed, dtype=np.int64),
+        "seconds": np.array(seconds, dtype=np.int64),
+    }
+
+
+def concat_columns(*parts: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Concatenate column dicts (e.g. live rows and compacted summaries)"""
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def empty_columns() -> Dict[str, np.ndarray]:
+    """Column arrays for a user with no practice rows"""
+    return {
+        "dates": np.array([], dtype="datetime64[D]"),
+        "sessions": np.array([], dtype=np.int64),
+        "completed": np.array([], dtype=np.int64),
+        "seconds": np.array([], dtype=np.int64),
+    }
+
+
+# ============================================================================
+# BUCKETING
+# ============================================================================
+
+def bucket_start(days: np.ndarray, bucket: str) -> np.ndarray:
+    """Map datetime64[D] values to the first day of their bucket"""
+    if bucket == "day":
+        return days
+    if bucket == "week":
+        # 1970-01-01 was a Thursday; shift so buckets start on Monday
+        weekday = (days.astype(np.int64) + 3) % 7
+        return days - weekday.astype("timedelta64[D]")
+    if bucket == "month":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    raise ValueError(f"Unknown bucket: {bucket}")
+
+
+def bucket_practice(columns: Dict[str, np.ndarray], start: date, end: date, bucket: str = "day") -> Dict:
+    """
+    Aggregate practice columns into contiguous calendar buckets.
+
+    Every bucket between start and end is present in the result (empty
+    buckets are zero), so the arrays can be plotted directly.
+    """
+    first = bucket_start(np.array([start], dtype="datetime64[D]"), bucket)[0]
+    last = bucket_start(np.array([end], dtype="datetime64[D]"), bucket)[0]
+
+    if bucket == "month":
+        labels = np.arange(
+            first.astype("datetime64[M]"), last.astype("datetime64[M]") + 1
+        ).astype("datetime64[D]")
+    else:
+        step = 7 if bucket == "week" else 1
+        labels = np.arange(first, last + 1, step)
+
+    dates = columns["dates"]
+    in_range = (dates >= np.datetime64(start)) & (dates <= np.datetime64(end))
+    starts = bucket_start(dates[in_range], bucket)
+    index = np.searchsorted(labels, starts)
+
+    def total(name: str) -> list:
+        return np.bincount(
+            index, weights=columns[name][in_range], minlength=len(labels)
+        ).astype(np.int64).tolist()
+
+    return {
+        "bucket": bucket,
+        "start_date": start,
+        "end_date": end,
+        "labels": labels.astype(date).tolist(),
+        "sessions": total("sessions"),
+        "completed": total("completed"),
+        "time_seconds": total("seconds"),
+    }
+
+
+def practice_calendar(db: Session, user_id: int, days: int = 365, bucket: str = "day") -> Dict:
+    """Build the calendar heatmap / trend payload for a user"""
+    end = datetime.utcnow().date()
+    start = end - timedelta(days=days - 1)
+    columns = concat_columns(
+        load_practice_columns(db, user_id, start),
+        load_summary_columns(db, user_id, start)
+    )
+    return bucket_practice(columns, start, end, bucket)
+
+
+# ============================================================================
+# STATS
+# ============================================================================
+
+def progress_stats_for_users(db: Session, user_ids: List[int]) -> Dict[int, ProgressStats]:
+    """
+    Progress statistics for several users with grouped queries.
+
+    Totals blend live rows with compacted daily summaries. Issues four
+    queries (GROUP BY user_id) however many users are given.
+    """
+    if not user_ids:
+        return {}
+
+    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    today_end = today_start + timedelta(days=1)
+
+    # Live totals and completed today
+    live_totals = {
+        user_id: (practices, seconds or 0, completed_today or 0)
+        for user_id, practices, seconds, completed_today in db.query(
+            Progress.user_id,
+            func.count(Progress.id),
+            func.sum(Progress.completion_time),
+            func.sum(case((
+                (Progress.is_completed == True) &
+                (Progress.practice_date >= today_start) &
+                (Progress.practice_date < today_end), 1
+            ), else_=0))
+        ).filter(Progress.user_id.in_(user_ids)).group_by(Progress.user_id)
+    }
+
+    summary_totals = {
+        user_id: (practices or 0, seconds or 0)
+        for user_id, practices, seconds in db.query(
+            ProgressSummary.user_id,
+            func.sum(ProgressSummary.session_count),
+            func.sum(ProgressSummary.total_time)
+        ).filter(ProgressSummary.user_id.in_(user_ids)).group_by(ProgressSummary.user_id)
+    }
+
+    # Favorite yogasana: most sessions per user across live rows and summaries
+    pose_counts = union_all(
+        db.query(
+            Progress.user_id.label("user_id"),
+            Progress.yogasana_name.label("name"),
+            literal(1).label("sessions")
+        ).filter(Progress.user_id.in_(user_ids)),
+        db.query(
+            ProgressSummary.user_id, ProgressSummary.yogasana_name, ProgressSummary.session_count
+        ).filter(ProgressSummary.user_id.in_(user_ids))
+    ).subquery()
+    favorites = {}
+    for user_id, name, sessions in db.query(
+        pose_counts.c.user_id, pose_counts.c.name, func.sum(pose_counts.c.sessions)
+    ).group_by(pose_counts.c.user_id, pose_counts.c.name):
+        if user_id not in favorites or sessions > favorites[user_id][1]:
+            favorites[user_id] = (name, sessions)
+
+    streaks = calculate_practice_streaks(db, user_ids)
+
+    stats = {}
+    for user_id in user_ids:
+        live_practices, live_seconds, completed_today = live_totals.get(user_id, (0, 0, 0))
+        summary_practices, summary_seconds = summary_totals.get(user_id, (0, 0))
+        favorite = favorites.get(user_id)
+        stats[user_id] = ProgressStats(
+            total_practices=live_practices + summary_practices,
+            total_time_minutes=int(live_seconds + summary_seconds) // 60,
+            completed_today=completed_today,
+            favorite_yogasana=favorite[0] if favorite else None,
+            practice_streak=streaks.get(user_id, 0)
+        )
+
+    return stats
+
+
+def calculate_practice_streaks(db: Session, user_ids: List[int]) -> Dict[int, int]:
+    """
+    Consecutive days of practice ending today, for several users at once.
+
+    Reads each user's distinct practice days of the last year (live rows
+    and summaries) in one query ordered newest first and walks it once.
+    """
+    current_date = datetime.utcnow().date()
+    since = current_date - timedelta(days=365)
+
+    practice_days = union_all(
+        db.query(
+            Progress.user_id.label("user_id"), func.date(Progress.practice_date).label("day")
+        ).filter(
+            (Progress.user_id.in_(user_ids)) &
+            (Progress.practice_date >= datetime.combine(since, datetime.min.time()))
+        ),
+        db.query(ProgressSummary.user_id, ProgressSummary.summary_date).filter(
+            (ProgressSummary.user_id.in_(user_ids)) &
+            (ProgressSummary.summary_date >= since)
+        )
+    ).subquery()
+
+    streaks = {}
+    broken = set()
+    for user_id, day in db.query(practice_days.c.user_id, practice_days.c.day).distinct().order_by(
+        practice_days.c.user_id, practice_days.c.day.desc()
+    ):
+        if user_id in broken:
+            continue
+        streak = streaks.get(user_id, 0)
+        if str(day) == str(current_date - timedelta(days=streak)):
+            streaks[user_id] = streak + 1
+        else:
+            broken.add(user_id)
+
+    return streaks
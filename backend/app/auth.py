@@ -1,13 +1,14 @@
+import hmac
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthCredentials
 
-from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
-from app.database import get_db
+from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, ADMIN_TOKEN
+from app.database import get_db, get_read_db
 from app.models import User
 from app.schemas import TokenData
 
@@ -72,6 +73,19 @@ async def get_current_user(
     db: Session = Depends(get_db)
 ) -> User:
     """Get current authenticated user from token"""
+    return authenticate(credentials, db)
+
+
+async def get_current_reader(
+    credentials: HTTPAuthCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+) -> User:
+    """Get current authenticated user for a read-only endpoint (read session)"""
+    return authenticate(credentials, db)
+
+
+def authenticate(credentials: HTTPAuthCredentials, db: Session) -> User:
+    """Resolve bearer credentials to an active user and pin the session to them"""
     token = credentials.credentials
     token_data = decode_access_token(token)
     
@@ -95,4 +109,22 @@ async def get_current_user(
             detail="Inactive user",
         )
     
+    # Lets session listeners attribute this request's writes to the user
+    db.info["user_id"] = user.id
+    
     return user
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Require the configured admin token in the X-Admin-Token header"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin API is disabled",
+        )
+    
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid admin token",
+        )
@@ -0,0 +1,308 @@
+"""
+Online database backups.
+
+Copies SQLite databases with SQLite's online backup API a few pages at a
+time, pausing between steps so API writers are never locked out for the
+whole copy. Snapshots can be gzipped, verified with `PRAGMA
+integrity_check` and restored (also through the backup API, in a single
+step, so open connections see either the old or the restored database,
+never a mix).
+
+Run from the backend directory:
+
+    python -m app.backup backup [--output-dir ./backups] [--gzip] [--pages 256] [--pause-ms 50]
+    python -m app.backup verify SNAPSHOT
+    python -m app.backup restore SNAPSHOT [--target ./wellness_guide.db]
+"""
+import argparse
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import BACKUP_DIR, BACKUP_PAGES_PER_STEP, BACKUP_STEP_PAUSE_MS
+from app.database import engine, sqlite_file
+
+# Progress of the backup started from the admin API (one at a time)
+backup_status: Dict[str, object] = {"running": False}
+_backup_lock = threading.Lock()
+
+
+def backup_targets() -> List[Tuple[str, str]]:
+    """
+    (label, file path) of the databases to back up.
+
+    Raises ValueError if the database is not a file-based SQLite database.
+    """
+    path = sqlite_file(engine.url)
+    if path is None:
+        raise ValueError(f"Online backup needs a file-based SQLite database, not {engine.url}")
+    return [("main", path)]
+
+
+# ============================================================================
+# BACKUP
+# ============================================================================
+
+class _CopyRestarted(Exception):
+    """Another connection wrote to the source, so SQLite restarted the copy"""
+
+
+def backup_database(
+    source_path: str,
+    destination_path: str,
+    pages: int = BACKUP_PAGES_PER_STEP,
+    pause_ms: float = BACKUP_STEP_PAUSE_MS,
+    report: Optional[Callable[[dict], None]] = None
+) -> dict:
+    """
+    Copy a live SQLite database page by page.
+
+    Each step holds a read lock for `pages` pages only; between steps the
+    copy sleeps `pause_ms` so writers get the lock. A write from another
+    connection makes SQLite restart the copy from page one, which under
+    steady traffic would never finish, so every restart quadruples the
+    step size until one step covers the whole database. `report` gets a
+    progress dict after every step.
+    """
+    source = sqlite3.connect(source_path)
+    destination = sqlite3.connect(destination_path)
+    page_size = source.execute("PRAGMA page_size").fetchone()[0]
+    started = time.perf_counter()
+    progress = {"pages_copied": 0, "pages_total": 0, "steps": 0, "restarts": 0, "pages_per_step": pages}
+
+    def step(status, remaining, total):
+        copied = total - remaining
+        if 0 < copied <= progress["pages_copied"]:
+            # No forward progress since the last step: the copy started over
+            raise _CopyRestarted()
+
+        elapsed = time.perf_counter() - started
+        progress.update(
+            pages_copied=copied,
+            pages_total=total,
+            steps=progress["steps"] + 1,
+            mb_per_second=round(copied * page_size / 2**20 / elapsed, 2) if elapsed else None,
+        )
+        if report is not None:
+            report(dict(progress))
+        if remaining and pause_ms > 0:
+            time.sleep(pause_ms / 1000)
+
+    try:
+        while True:
+            try:
+                source.backup(destination, pages=progress["pages_per_step"], progress=step)
+                break
+            except _CopyRestarted:
+                progress["restarts"] += 1
+                progress["pages_copied"] = 0
+                if progress["pages_per_step"] > 0:
+                    progress["pages_per_step"] *= 4
+    finally:
+        destination.close()
+        source.close()
+
+    seconds = time.perf_counter() - started
+    # The file size is misleading for a WAL destination (pages may still be in the -wal file)
+    size = progress["pages_total"] * page_size
+    return {
+        "path": destination_path,
+        "bytes": size,
+        "pages": progress["pages_total"],
+        "steps": progress["steps"],
+        "restarts": progress["restarts"],
+        "seconds": round(seconds, 3),
+        "mb_per_second": round(size / 2**20 / seconds, 2) if seconds else None,
+    }
+
+
+def compress_file(path: str) -> str:
+    """Gzip a file next to itself and remove the original"""
+    compressed_path = path + ".gz"
+    with open(path, "rb") as raw, gzip.open(compressed_path, "wb") as compressed:
+        shutil.copyfileobj(raw, compressed)
+    os.remove(path)
+    return compressed_path
+
+
+def snapshot_all(
+    output_dir: str = BACKUP_DIR,
+    compress: bool = False,
+    pages: int = BACKUP_PAGES_PER_STEP,
+    pause_ms: float = BACKUP_STEP_PAUSE_MS,
+    report: Optional[Callable[[str, dict], None]] = None
+) -> List[dict]:
+    """Back up the database into `output_dir`"""
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    results = []
+
+    for label, source_path in backup_targets():
+        name = os.path.splitext(os.path.basename(source_path))[0]
+        destination_path = os.path.join(output_dir, f"{name}-{stamp}.db")
+
+        result = backup_database(
+            source_path, destination_path, pages, pause_ms,
+            report=None if report is None else lambda progress, label=label: report(label, progress)
+        )
+        if compress:
+            result["path"] = compress_file(destination_path)
+            result["compressed_bytes"] = os.path.getsize(result["path"])
+        results.append({"database": label, **result})
+
+    return results
+
+
+# ============================================================================
+# VERIFY AND RESTORE
+# ============================================================================
+
+def open_snapshot(snapshot_path: str) -> Tuple[str, Optional[str]]:
+    """Path of a readable database file for a snapshot, plus a temp file to clean up"""
+    if not snapshot_path.endswith(".gz"):
+        return snapshot_path, None
+
+    handle, temp_path = tempfile.mkstemp(suffix=".db")
+    with os.fdopen(handle, "wb") as raw, gzip.open(snapshot_path, "rb") as compressed:
+        shutil.copyfileobj(compressed, raw)
+    return temp_path, temp_path
+
+
+def verify_snapshot(snapshot_path: str) -> dict:
+    """Run PRAGMA integrity_check on a snapshot and count rows per table"""
+    database_path, temp_path = open_snapshot(snapshot_path)
+    try:
+        connection = sqlite3.connect(f"file:{database_path}?mode=ro", uri=True)
+        try:
+            problems = [row[0] for row in connection.execute("PRAGMA integrity_check")]
+            tables = [row[0] for row in connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+            )]
+            counts = {
+                table: connection.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+                for table in tables
+            }
+        except sqlite3.DatabaseError as exc:
+            # Not a database at all, or too damaged for integrity_check to run
+            problems, counts = [str(exc)], {}
+        finally:
+            connection.close()
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+    return {"path": snapshot_path, "ok": problems == ["ok"], "integrity": problems, "tables": counts}
+
+
+def restore_snapshot(snapshot_path: str, target_path: str) -> dict:
+    """
+    Verify a snapshot, then copy it over `target_path` with the backup API.
+
+    The copy runs in one step: the target stays write-locked until the copy
+    finishes, so pausing between steps would only lock writers out longer.
+
+    Raises ValueError (leaving the target untouched) if the snapshot
+    fails its integrity check.
+    """
+    verification = verify_snapshot(snapshot_path)
+    if not verification["ok"]:
+        raise ValueError(f"Snapshot failed integrity check: {verification['integrity'][:5]}")
+
+    database_path, temp_path = open_snapshot(snapshot_path)
+    try:
+        result = backup_database(database_path, target_path, pages=-1, pause_ms=0)
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+    return {**result, "tables": verification["tables"]}
+
+
+# ============================================================================
+# ADMIN API BACKGROUND TASK
+# ============================================================================
+
+def start_background_backup(compress: bool) -> bool:
+    """
+    Claim the backup slot; False if a backup is already running.
+
+    Raises ValueError if a database is not a file-based SQLite database.
+    """
+    backup_targets()
+
+    with _backup_lock:
+        if backup_status.get("running"):
+            return False
+        backup_status.clear()
+        backup_status.update(
+            running=True, compressed=compress, started_at=datetime.utcnow(),
+            finished_at=None, current=None, databases=[], error=None
+        )
+    return True
+
+
+def run_background_backup(compress: bool, output_dir: str = BACKUP_DIR):
+    """Snapshot the database, recording progress in backup_status"""
+    def report(label, progress):
+        backup_status["current"] = {"database": label, **progress}
+
+    try:
+        backup_status["databases"] = snapshot_all(output_dir, compress, report=report)
+    except Exception as exc:
+        backup_status["error"] = str(exc)
+    finally:
+        backup_status.update(running=False, current=None, finished_at=datetime.utcnow())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Online backups of the SQLite databases")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backup_parser = commands.add_parser("backup", help="snapshot the database")
+    backup_parser.add_argument("--output-dir", default=BACKUP_DIR, help="directory for snapshot files")
+    backup_parser.add_argument("--gzip", action="store_true", help="compress snapshots")
+    backup_parser.add_argument("--pages", type=int, default=BACKUP_PAGES_PER_STEP,
+                               help="pages copied per step")
+    backup_parser.add_argument("--pause-ms", type=float, default=BACKUP_STEP_PAUSE_MS,
+                               help="pause between steps so writers can proceed")
+
+    verify_parser = commands.add_parser("verify", help="integrity-check a snapshot")
+    verify_parser.add_argument("snapshot")
+
+    restore_parser = commands.add_parser("restore", help="verify a snapshot and restore it")
+    restore_parser.add_argument("snapshot")
+    restore_parser.add_argument("--target", default=None,
+                                help="database file to overwrite (default: the main database)")
+    args = parser.parse_args()
+
+    if args.command == "backup":
+        def print_progress(label, progress):
+            print(
+                f"\r[{label}] {progress['pages_copied']}/{progress['pages_total']} pages, "
+                f"{progress['mb_per_second']} MB/s", end="", flush=True
+            )
+
+        for result in snapshot_all(args.output_dir, args.gzip, args.pages, args.pause_ms, print_progress):
+            print(
+                f"\n[{result['database']}] {result['path']}: {result['pages']} pages in "
+                f"{result['steps']} steps ({result['restarts']} restarts), "
+                f"{result['seconds']} s ({result['mb_per_second']} MB/s)"
+            )
+
+    elif args.command == "verify":
+        result = verify_snapshot(args.snapshot)
+        print("OK" if result["ok"] else "FAILED: " + "; ".join(result["integrity"][:10]))
+        for table, count in sorted(result["tables"].items()):
+            print(f"  {table}: {count} rows")
+        raise SystemExit(0 if result["ok"] else 1)
+
+    elif args.command == "restore":
+        target = args.target or backup_targets()[0][1]
+        result = restore_snapshot(args.snapshot, target)
+        print(f"Restored {args.snapshot} to {target}: {result['pages']} pages in {result['seconds']} s")
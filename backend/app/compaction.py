@@ -0,0 +1,228 @@
+"""
+Progress history compaction.
+
+Rolls `progress` rows older than a horizon into `progress_summaries`
+(one row per user, day and pose), archives the raw rows to a gzipped
+JSON Lines file and vacuums the database so the hot table and its
+indexes stay small.
+
+Run from the backend directory:
+
+    python -m app.compaction [--days 90] [--archive-dir ./archive] [--no-vacuum]
+"""
+import argparse
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import case, func, literal, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from config import (
+    PROGRESS_COMPACTION_DAYS, PROGRESS_ARCHIVE_DIR, SYNC_TOMBSTONE_RETENTION_DAYS,
+    IDEMPOTENCY_KEY_RETENTION_HOURS
+)
+from app.database import (
+    init_db, SessionLocal, UPSERT_INSERTS,
+    ChangeCounter, IdempotencyKey, Progress, ProgressSummary, Tombstone
+)
+
+ARCHIVE_COLUMNS = (
+    "id", "user_id", "routine_id", "yogasana_id", "yogasana_name",
+    "completion_time", "is_completed", "notes", "practice_date", "created_at",
+)
+
+
+def compaction_cutoff(horizon_days: int) -> datetime:
+    """Start of the oldest day that is kept as live rows"""
+    if horizon_days < 1:
+        raise ValueError("Compaction horizon must be at least one day")
+    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return today_start - timedelta(days=horizon_days)
+
+
+def archive_rows(db: Session, cutoff: datetime, max_id: int, archive_dir: str) -> str:
+    """Stream the rows being compacted into a gzipped JSON Lines file"""
+    os.makedirs(archive_dir, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    path = os.path.join(archive_dir, f"progress-before-{cutoff:%Y%m%d}-{stamp}.jsonl.gz")
+
+    columns = [getattr(Progress, name) for name in ARCHIVE_COLUMNS]
+    rows = db.query(*columns).filter(
+        (Progress.practice_date < cutoff) & (Progress.id <= max_id)
+    ).order_by(Progress.id).yield_per(5000)
+
+    with gzip.open(path, "wt", encoding="utf-8") as archive:
+        for row in rows:
+            record = dict(zip(ARCHIVE_COLUMNS, row))
+            for key in ("practice_date", "created_at"):
+                if record[key] is not None:
+                    record[key] = record[key].isoformat()
+            archive.write(json.dumps(record) + "\n")
+
+    return path
+
+
+def summarize_rows(db: Session, cutoff: datetime, max_id: int) -> int:
+    """
+    Merge per-day, per-pose aggregates of old rows into progress_summaries.
+
+    A single INSERT ... SELECT ... ON CONFLICT DO UPDATE: earlier runs may
+    already hold a summary for the same key (e.g. after the horizon was
+    shortened) and are added to in the database, without loading them.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect not in UPSERT_INSERTS:
+        raise ValueError(f"Compaction needs INSERT ... ON CONFLICT support, not available for {dialect}")
+
+    day = func.date(Progress.practice_date)
+    groups = select(
+        Progress.user_id,
+        day,
+        Progress.yogasana_id,
+        func.max(Progress.yogasana_name),
+        func.count(Progress.id),
+        func.sum(case((Progress.is_completed == True, 1), else_=0)),
+        func.sum(func.coalesce(Progress.completion_time, 0)),
+        literal(datetime.utcnow())
+    ).where(
+        (Progress.practice_date < cutoff) & (Progress.id <= max_id)
+    ).group_by(Progress.user_id, day, Progress.yogasana_id)
+
+    insert = UPSERT_INSERTS[dialect](ProgressSummary).from_select(
+        ["user_id", "summary_date", "yogasana_id", "yogasana_name",
+         "session_count", "completed_count", "total_time", "created_at"],
+        groups
+    )
+    result = db.execute(insert.on_conflict_do_update(
+        index_elements=["user_id", "summary_date", "yogasana_id"],
+        set_={
+            "session_count": ProgressSummary.session_count + insert.excluded.session_count,
+            "completed_count": ProgressSummary.completed_count + insert.excluded.completed_count,
+            "total_time": ProgressSummary.total_time + insert.excluded.total_time,
+        }
+    ))
+    return result.rowcount
+
+
+def purge_tombstones(db: Session, retention_days: int = SYNC_TOMBSTONE_RETENTION_DAYS) -> int:
+    """
+    Delete sync tombstones older than the retention.
+
+    Each user's counter remembers the newest purged change id; sync
+    tokens older than that get a full resync.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    newest_purged = select(func.max(Tombstone.change_id)).where(
+        (Tombstone.user_id == ChangeCounter.user_id) & (Tombstone.deleted_at < cutoff)
+    ).scalar_subquery()
+    db.execute(
+        update(ChangeCounter).where(newest_purged > ChangeCounter.purged_change_id).values(
+            purged_change_id=newest_purged
+        )
+    )
+    purged = db.query(Tombstone).filter(Tombstone.deleted_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return purged
+
+
+def purge_idempotency_keys(db: Session, retention_hours: int = IDEMPOTENCY_KEY_RETENTION_HOURS) -> int:
+    """Delete stored Idempotency-Key responses older than the retention"""
+    cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+    purged = db.query(IdempotencyKey).filter(IdempotencyKey.created_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return purged
+
+
+def vacuum_database(bind: Engine):
+    """Reclaim space freed by compaction (must run outside a transaction)"""
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if bind.dialect.name == "sqlite":
+            connection.exec_driver_sql("VACUUM")
+        elif bind.dialect.name == "postgresql":
+            connection.exec_driver_sql("VACUUM ANALYZE progress")
+
+
+def compact_progress(
+    db: Session,
+    horizon_days: int = PROGRESS_COMPACTION_DAYS,
+    archive_dir: str = PROGRESS_ARCHIVE_DIR,
+    vacuum: bool = True
+) -> Dict[str, Optional[object]]:
+    """
+    Compact progress rows older than `horizon_days`.
+
+    Summaries are written and raw rows deleted in one transaction, after
+    the archive file has been written. If the transaction fails the
+    archive file is removed again and the live rows are untouched.
+    """
+    cutoff = compaction_cutoff(horizon_days)
+    purged_tombstones = purge_tombstones(db)
+    purged_idempotency_keys = purge_idempotency_keys(db)
+
+    # Bound the run by id so rows written while it runs are left alone
+    max_id = db.query(func.max(Progress.id)).filter(
+        Progress.practice_date < cutoff
+    ).scalar()
+    if max_id is None:
+        return {
+            "cutoff": cutoff,
+            "archived_rows": 0,
+            "summary_rows": 0,
+            "purged_tombstones": purged_tombstones,
+            "purged_idempotency_keys": purged_idempotency_keys,
+            "archive_path": None,
+        }
+
+    archive_path = archive_rows(db, cutoff, max_id, archive_dir)
+    try:
+        summary_rows = summarize_rows(db, cutoff, max_id)
+        archived_rows = db.query(Progress).filter(
+            (Progress.practice_date < cutoff) & (Progress.id <= max_id)
+        ).delete(synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        os.remove(archive_path)
+        raise
+
+    if vacuum:
+        vacuum_database(db.get_bind())
+
+    return {
+        "cutoff": cutoff,
+        "archived_rows": archived_rows,
+        "summary_rows": summary_rows,
+        "purged_tombstones": purged_tombstones,
+        "purged_idempotency_keys": purged_idempotency_keys,
+        "archive_path": archive_path,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact old progress rows into daily summaries")
+    parser.add_argument("--days", type=int, default=PROGRESS_COMPACTION_DAYS,
+                        help="keep this many days of raw progress rows")
+    parser.add_argument("--archive-dir", default=PROGRESS_ARCHIVE_DIR,
+                        help="directory for the gzipped archive of compacted rows")
+    parser.add_argument("--no-vacuum", action="store_true", help="skip VACUUM afterwards")
+    args = parser.parse_args()
+
+    init_db()
+    session = SessionLocal()
+    try:
+        result = compact_progress(session, args.days, args.archive_dir, vacuum=not args.no_vacuum)
+    finally:
+        session.close()
+
+    print(
+        f"Compacted {result['archived_rows']} rows older than {result['cutoff']:%Y-%m-%d} "
+        f"into {result['summary_rows']} summary groups, "
+        f"purged {result['purged_tombstones']} sync tombstones and "
+        f"{result['purged_idempotency_keys']} idempotency keys"
+    )
+    if result["archive_path"]:
+        print(f"Archive: {result['archive_path']}")
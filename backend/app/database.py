@@ -1,17 +1,163 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Float
+from sqlalchemy import create_engine, make_url, Column, Integer, String, Date, DateTime, Boolean, ForeignKey, Text, Float, Index, UniqueConstraint, Table, event, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.engine import URL
+from sqlalchemy.orm import Session, sessionmaker, relationship
+from collections import OrderedDict
 from datetime import datetime
-from config import DATABASE_URL
+from typing import Optional, Union
+import os
+import threading
+import time
+from config import DATABASE_URL, READ_DATABASE_URL, READ_POOL_SIZE, READ_STICKY_SECONDS
+
+
+def make_engine(url: str):
+    """Create a database engine for a URL"""
+    new_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False} if "sqlite" in url else {}
+    )
+
+    # SQLite only honours ON DELETE CASCADE with foreign key enforcement on
+    if url.startswith("sqlite"):
+        @event.listens_for(new_engine, "connect")
+        def enable_foreign_keys(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+
+    # Write-ahead logging lets the read-only pool read while a write is in progress
+    if sqlite_file(url):
+        @event.listens_for(new_engine, "connect")
+        def enable_wal(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.close()
+
+    return new_engine
+
+
+def make_read_engine(url: str):
+    """
+    Create a read-only engine with its own pool for a database URL.
+
+    SQLite files are opened with `mode=ro` and `PRAGMA query_only`;
+    PostgreSQL sessions are set to read-only transactions. Returns None
+    for in-memory SQLite, which a second pool could not see.
+    """
+    path = sqlite_file(url)
+    if url.startswith("sqlite") and path is None:
+        return None
+
+    if path is not None:
+        read_engine = create_engine(
+            f"sqlite:///file:{path}?mode=ro&uri=true",
+            connect_args={"check_same_thread": False},
+            pool_size=READ_POOL_SIZE
+        )
+        read_only_statement = "PRAGMA query_only=ON"
+    else:
+        read_engine = create_engine(url, pool_size=READ_POOL_SIZE)
+        read_only_statement = (
+            "SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY"
+            if read_engine.dialect.name == "postgresql" else None
+        )
+
+    if read_only_statement:
+        @event.listens_for(read_engine, "connect")
+        def set_read_only(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(read_only_statement)
+            cursor.close()
+
+    return read_engine
+
+
+def sqlite_file(url: Union[str, URL]) -> Optional[str]:
+    """Absolute path of a file-based SQLite URL (None for other databases)"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or parsed.database in (None, "", ":memory:"):
+        return None
+    return os.path.abspath(parsed.database)
+
 
 # Create database engine
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+engine = make_engine(DATABASE_URL)
+
+# Read-only pool for the read session (falls back to the primary engine for
+# in-memory SQLite). READ_DATABASE_URL can point at a replica.
+read_engine = make_read_engine(READ_DATABASE_URL or DATABASE_URL) or engine
+
+
+class ReadSession(Session):
+    """
+    Session for read-only endpoints, bound to the read-only pool.
+
+    For READ_STICKY_SECONDS after a user's own write commits, that user's
+    reads go to the primary instead (read-your-writes with a lagging replica).
+    """
 
-# Session factory
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if recently_wrote(self.info.get("user_id")):
+            return engine
+        return read_engine
+
+
+# Session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(class_=ReadSession, autocommit=False, autoflush=False)
+
+
+# ============================================================================
+# READ-YOUR-WRITES STICKINESS
+# ============================================================================
+
+# user id -> monotonic time of their last committed write, oldest first
+_last_writes: "OrderedDict[int, float]" = OrderedDict()
+_last_writes_lock = threading.Lock()
+
+
+def recently_wrote(user_id: Optional[int]) -> bool:
+    """Whether a user committed a write within READ_STICKY_SECONDS"""
+    if user_id is None or READ_STICKY_SECONDS <= 0:
+        return False
+    with _last_writes_lock:
+        written_at = _last_writes.get(user_id)
+    return written_at is not None and time.monotonic() - written_at < READ_STICKY_SECONDS
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def mark_flushed_write(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def mark_bulk_write(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def record_user_write(session):
+    user_id = session.info.get("user_id")
+    if not session.info.pop("wrote", False) or user_id is None or READ_STICKY_SECONDS <= 0:
+        return
+
+    now = time.monotonic()
+    with _last_writes_lock:
+        _last_writes[user_id] = now
+        _last_writes.move_to_end(user_id)
+        # Forget users whose window has passed so the map stays small
+        while _last_writes and now - next(iter(_last_writes.values())) >= READ_STICKY_SECONDS:
+            _last_writes.popitem(last=False)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def forget_rolled_back_write(session):
+    session.info.pop("wrote", None)
 
 # Base class for models
 Base = declarative_base()
@@ -35,8 +181,11 @@ class User(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
-    routines = relationship("Routine", back_populates="owner", cascade="all, delete-orphan")
-    progress = relationship("Progress", back_populates="user", cascade="all, delete-orphan")
+    routines = relationship("Routine", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True)
+    progress = relationship("Progress", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    progress_summaries = relationship("ProgressSummary", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    tombstones = relationship("Tombstone", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    idempotency_keys = relationship("IdempotencyKey", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class Routine(Base):
@@ -44,19 +193,35 @@ class Routine(Base):
     __tablename__ = "routines"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     title = Column(String(255), nullable=False)
     goal = Column(String(255), nullable=False)
     description = Column(Text)
     yogasana_ids = Column(Text)  # JSON string of yogasana IDs
     duration_minutes = Column(Integer)  # Total routine duration
     is_active = Column(Boolean, default=True)
+    version = Column(Integer, nullable=False, default=1)  # Bumped on every write (optimistic concurrency)
+    change_id = Column(Integer, nullable=False, default=0)  # Delta sync position of the last write
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     owner = relationship("User", back_populates="routines")
-    progress = relationship("Progress", back_populates="routine", cascade="all, delete-orphan")
+    progress = relationship("Progress", back_populates="routine", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        # Delta sync scans (GET /sync)
+        Index("ix_routines_user_change_id", "user_id", "change_id"),
+        # At most one active routine per user
+        Index(
+            "uq_routines_active_per_user", "user_id",
+            unique=True,
+            sqlite_where=text("is_active = 1"),
+            postgresql_where=text("is_active")
+        ),
+        # Never reuse ids of deleted rows (sync tombstones refer to them)
+        {"sqlite_autoincrement": True},
+    )
 
 
 class Progress(Base):
@@ -64,20 +229,153 @@ class Progress(Base):
     __tablename__ = "progress"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    routine_id = Column(Integer, ForeignKey("routines.id"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    routine_id = Column(Integer, ForeignKey("routines.id", ondelete="CASCADE"), nullable=True)
     yogasana_id = Column(String(100))  # ID of the yoga pose
     yogasana_name = Column(String(255))
     completion_time = Column(Integer)  # Time spent in seconds
     is_completed = Column(Boolean, default=False)
     notes = Column(Text)
     practice_date = Column(DateTime, default=datetime.utcnow)
+    change_id = Column(Integer, nullable=False, default=0)  # Delta sync position of the last write
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     user = relationship("User", back_populates="progress")
     routine = relationship("Routine", back_populates="progress")
 
+    __table_args__ = (
+        # Delta sync scans (GET /sync)
+        Index("ix_progress_user_change_id", "user_id", "change_id"),
+        # Date-range scans per user (streaks, calendar); covers the
+        # columns the calendar aggregates so no table lookups are needed
+        Index(
+            "ix_progress_user_practice_date",
+            "user_id", "practice_date", "completion_time", "is_completed"
+        ),
+        # Never reuse ids of deleted rows (sync tombstones refer to them)
+        {"sqlite_autoincrement": True},
+    )
+
+
+class ProgressSummary(Base):
+    """Per-user, per-day, per-pose rollup of compacted progress rows"""
+    __tablename__ = "progress_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    summary_date = Column(Date, nullable=False)
+    yogasana_id = Column(String(100))
+    yogasana_name = Column(String(255))
+    session_count = Column(Integer, default=0)  # Number of compacted rows
+    completed_count = Column(Integer, default=0)
+    total_time = Column(Integer, default=0)  # Time spent in seconds
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    user = relationship("User", back_populates="progress_summaries")
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "summary_date", "yogasana_id", name="uq_progress_summary_day_pose"),
+    )
+
+
+class Tombstone(Base):
+    """Record of a deleted routine or progress row, for delta sync"""
+    __tablename__ = "tombstones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    entity = Column(String(20), nullable=False)  # "routine" or "progress"
+    entity_id = Column(Integer, nullable=False)
+    change_id = Column(Integer, nullable=False, default=0)  # Delta sync position of the deletion
+    deleted_at = Column(DateTime, default=datetime.utcnow, index=True)  # Retention purge
+
+    # Relationships
+    user = relationship("User", back_populates="tombstones")
+
+    __table_args__ = (
+        Index("ix_tombstones_user_change_id", "user_id", "change_id"),
+    )
+
+
+class ChangeCounter(Base):
+    """Per-user delta sync counter (the last change id handed out)"""
+    __tablename__ = "change_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    change_id = Column(Integer, nullable=False, default=0)
+    purged_change_id = Column(Integer, nullable=False, default=0)  # Newest purged tombstone
+
+
+class IdempotencyKey(Base):
+    """Stored response of a write sent with an Idempotency-Key header"""
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    key = Column(String(255), nullable=False)
+    endpoint = Column(String(255), nullable=False)  # "POST /api/v1/progress/"
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(Text, nullable=False)  # JSON
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    # Relationships
+    user = relationship("User", back_populates="idempotency_keys")
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),
+    )
+
+
+# ============================================================================
+# DELTA SYNC CHANGE IDS
+# ============================================================================
+
+# Dialect-specific INSERT constructs that support ON CONFLICT DO UPDATE
+UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+# Rows stamped with a change id on every insert and update
+SYNCED_MODELS = (Routine, Progress, Tombstone)
+
+
+def next_change_id(db: Session, user_id: int) -> int:
+    """
+    Change id for a user's writes in the current transaction.
+
+    Incrementing the user's counter row locks it until the transaction
+    ends, so change ids become visible in commit order and a sync token
+    never skips a transaction that committed late. All writes of one
+    transaction share one id.
+    """
+    change_ids = db.info.setdefault("change_ids", {})
+    if user_id not in change_ids:
+        counters = ChangeCounter.__table__
+        upsert = UPSERT_INSERTS[db.get_bind(clause=counters).dialect.name](counters).values(
+            user_id=user_id, change_id=1, purged_change_id=0
+        )
+        change_ids[user_id] = db.execute(
+            upsert.on_conflict_do_update(
+                index_elements=["user_id"],
+                set_={"change_id": counters.c.change_id + 1}
+            ).returning(counters.c.change_id)
+        ).scalar_one()
+    return change_ids[user_id]
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def assign_change_ids(session, flush_context, instances):
+    for instance in list(session.new) + list(session.dirty):
+        if isinstance(instance, SYNCED_MODELS) and (instance in session.new or session.is_modified(instance)):
+            instance.change_id = next_change_id(session, instance.user_id)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+@event.listens_for(SessionLocal, "after_rollback")
+def forget_change_ids(session):
+    session.info.pop("change_ids", None)
+
 
 # Create tables
 def init_db():
@@ -93,3 +391,39 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    """Get a read-only database session (for endpoints that never write)"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def purge_user(db: Session, user_id: int) -> bool:
+    """
+    Delete a user and everything they own without loading any of it.
+
+    A single DELETE on users cascades in the database (ON DELETE CASCADE).
+    Returns False if the user did not exist.
+    """
+    deleted = db.query(User).filter(User.id == user_id).delete(synchronize_session=False)
+    db.commit()
+    return deleted > 0
+
+
+def violates(exc: IntegrityError, table: Table, name: str) -> bool:
+    """Whether an IntegrityError was raised by the named unique index or constraint of `table`"""
+    unique = next(item for item in list(table.indexes) + list(table.constraints) if item.name == name)
+    message = str(exc.orig)
+    # PostgreSQL names the constraint; SQLite only lists its columns
+    columns = ", ".join(f"{table.name}.{column.name}" for column in unique.columns)
+    return name in message or message == f"UNIQUE constraint failed: {columns}"
+
+
+def violates_foreign_key(exc: IntegrityError) -> bool:
+    """Whether an IntegrityError was raised by a foreign key"""
+    message = str(exc.orig)
+    return "FOREIGN KEY constraint failed" in message or "violates foreign key constraint" in message
@@ -0,0 +1,182 @@
+"""
+Idempotency-Key support for retried writes.
+
+Clients retrying `POST /progress/` or `POST /routines/` send the same
+`Idempotency-Key` header on every attempt. The first attempt's response
+is stored in `idempotency_keys` in the same transaction as the write and
+kept in a bounded in-process LRU; repeats get the stored response back
+without running the write again. A duplicate that arrives while the
+first attempt is still running waits briefly for it, then gets 409.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import Depends, Header, HTTPException, Request, status
+from fastapi.responses import Response
+from pydantic import BaseModel
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_WAIT_SECONDS
+from app.database import get_db, SessionLocal, IdempotencyKey, User
+from app.auth import get_current_user
+
+# (user id, key) -> (endpoint, status code, JSON body)
+CacheKey = Tuple[int, str]
+StoredResponse = Tuple[str, int, str]
+
+
+class ResponseCache:
+    """Thread-safe LRU of stored responses"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, StoredResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key: CacheKey) -> Optional[StoredResponse]:
+        with self._lock:
+            stored = self._entries.get(cache_key)
+            if stored is not None:
+                self._entries.move_to_end(cache_key)
+            return stored
+
+    def put(self, cache_key: CacheKey, stored: StoredResponse):
+        with self._lock:
+            self._entries[cache_key] = stored
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+responses = ResponseCache(IDEMPOTENCY_CACHE_SIZE)
+
+# Keys whose first request is still running, so duplicates can wait on it
+_in_flight: Dict[CacheKey, threading.Event] = {}
+_in_flight_lock = threading.Lock()
+
+
+class IdempotentRequest:
+    """
+    Idempotency-Key state of one write request.
+
+    Routes return `replay()` when it is not None, and call `save()` with
+    their response before committing. Without the header both are no-ops.
+    """
+
+    def __init__(self, db: Session, user_id: int, key: Optional[str], endpoint: str):
+        self.db = db
+        self.key = key
+        self.endpoint = endpoint
+        self.cache_key = (user_id, key)
+        self.claimed = False
+
+    def replay(self) -> Optional[Response]:
+        """Stored response for a repeated key (waiting for an in-flight original)"""
+        if self.key is None:
+            return None
+
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            stored = self.stored_response()
+            if stored is not None:
+                return stored
+
+            with _in_flight_lock:
+                running = _in_flight.get(self.cache_key)
+                if running is None:
+                    _in_flight[self.cache_key] = threading.Event()
+                    self.claimed = True
+                    return None
+
+            # Wake up when the original finishes; if it failed, nothing was
+            # stored and the next loop claims the key for this request
+            # The wait blocks this threadpool worker, so it is kept short
+            if not running.wait(timeout=max(0, deadline - time.monotonic())):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still in progress",
+                    headers={"Retry-After": "1"}
+                )
+
+    def stored_response(self) -> Optional[Response]:
+        """Stored response for this key from the LRU or the database, if any"""
+        if self.key is None:
+            return None
+
+        stored = responses.get(self.cache_key)
+        if stored is None:
+            row = self.db.query(
+                IdempotencyKey.endpoint, IdempotencyKey.status_code, IdempotencyKey.response_body
+            ).filter(
+                (IdempotencyKey.user_id == self.cache_key[0]) & (IdempotencyKey.key == self.key)
+            ).first()
+            if row is None:
+                return None
+            stored = tuple(row)
+            responses.put(self.cache_key, stored)
+
+        endpoint, status_code, body = stored
+        if endpoint != self.endpoint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different endpoint"
+            )
+
+        return Response(
+            content=body,
+            status_code=status_code,
+            media_type="application/json",
+            headers={"Idempotent-Replayed": "true"}
+        )
+
+    def save(self, status_code: int, body: BaseModel):
+        """Store the response in the current transaction (cached once it commits)"""
+        if self.key is None:
+            return
+
+        stored = (self.endpoint, status_code, body.model_dump_json())
+        self.db.add(IdempotencyKey(
+            user_id=self.cache_key[0],
+            key=self.key,
+            endpoint=stored[0],
+            status_code=stored[1],
+            response_body=stored[2]
+        ))
+        self.db.info.setdefault("idempotent_responses", []).append((self.cache_key, stored))
+
+    def release(self):
+        """Wake duplicates waiting on this request"""
+        if self.claimed:
+            with _in_flight_lock:
+                _in_flight.pop(self.cache_key).set()
+            self.claimed = False
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def cache_committed_responses(session: Session):
+    for cache_key, stored in session.info.pop("idempotent_responses", []):
+        responses.put(cache_key, stored)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def discard_rolled_back_responses(session: Session):
+    session.info.pop("idempotent_responses", None)
+
+
+def idempotent_request(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Dependency: Idempotency-Key handling for a write endpoint"""
+    idempotent = IdempotentRequest(
+        db, current_user.id, idempotency_key, f"{request.method} {request.url.path}"
+    )
+    try:
+        yield idempotent
+    finally:
+        idempotent.release()
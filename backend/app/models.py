@@ -1,4 +1,4 @@
 """Database models - Import from database.py"""
-from app.database import User, Routine, Progress
+from app.database import User, Routine, Progress, ProgressSummary, Tombstone, ChangeCounter, IdempotencyKey
 
-__all__ = ["User", "Routine", "Progress"]
+__all__ = ["User", "Routine", "Progress", "ProgressSummary", "Tombstone", "ChangeCounter", "IdempotencyKey"]
@@ -0,0 +1,236 @@
+"""
+On-demand request profiling.
+
+A sampling profiler for individual requests: while a profiled request
+runs, one shared background thread snapshots the stacks of the worker
+threads running that request at a fixed interval, and the SQL statements
+the request executes are recorded.
+Results are kept in memory in collapsed-stack format (one line per
+stack: "frame;frame;frame count"), which flamegraph.pl and speedscope read.
+
+Nothing here is installed unless PROFILING_ENABLED is set, so disabled
+profiling adds no middleware, threadpool hook or SQL event listeners.
+"""
+import hmac
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+import anyio.to_thread
+from sqlalchemy import event
+
+from config import ADMIN_TOKEN, PROFILE_INTERVAL_MS, PROFILE_MAX_STORED, PROFILE_SAMPLE_RATE
+
+# Finished profiles, newest last
+profiles = deque(maxlen=PROFILE_MAX_STORED)
+
+_profile_ids = itertools.count(1)
+_current_profile: ContextVar[Optional[dict]] = ContextVar("current_profile", default=None)
+
+
+class StackSampler(threading.Thread):
+    """
+    Single background thread that samples the stacks of profiled requests.
+
+    Only threads registered by `profiled_thread()` are sampled, so each
+    profile sees its own request and never a concurrent one. The thread
+    sleeps until a profiled request is running.
+    """
+
+    def __init__(self, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.interval = interval
+        self._wake = threading.Event()
+
+    def run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with _registry_lock:
+                for profile in _active_profiles:
+                    profile["samples"] += 1
+                for thread_id, profile in _profiled_threads.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        profile["stacks"][collapse_frame(frame)] += 1
+                if not _active_profiles:
+                    self._wake.clear()
+
+    def wake(self):
+        self._wake.set()
+
+
+def collapse_frame(frame) -> str:
+    """Render a frame's stack root-first as func (file:line);... for collapsed output"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+# Profiles of running requests, and the worker threads currently running them
+_active_profiles: List[dict] = []
+_profiled_threads: Dict[int, dict] = {}
+_registry_lock = threading.Lock()
+_sampler: Optional[StackSampler] = None
+
+
+def start_profile(profile: dict):
+    """Register a running request's profile and wake the shared sampler"""
+    global _sampler
+    with _registry_lock:
+        _active_profiles.append(profile)
+        if _sampler is None:
+            _sampler = StackSampler(PROFILE_INTERVAL_MS / 1000)
+            _sampler.start()
+    _sampler.wake()
+
+
+def finish_profile(profile: dict):
+    """Stop sampling a request's profile"""
+    with _registry_lock:
+        _active_profiles.remove(profile)
+
+
+@contextmanager
+def profiled_thread(profile: dict):
+    """Sample the calling thread into `profile` while the block runs"""
+    thread_id = threading.get_ident()
+    with _registry_lock:
+        _profiled_threads[thread_id] = profile
+    try:
+        yield
+    finally:
+        with _registry_lock:
+            del _profiled_threads[thread_id]
+
+
+def install_thread_tracking():
+    """
+    Register threadpool threads while they run a profiled request's code.
+
+    Sync endpoints and dependencies run through anyio's threadpool, which
+    copies the caller's context, so the profile is known in the worker.
+    Async code on the event loop is shared by all requests and not sampled.
+    """
+    run_sync = anyio.to_thread.run_sync
+    if getattr(run_sync, "profiled", False):
+        return
+
+    async def run_sync_profiled(func, *args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return await run_sync(func, *args, **kwargs)
+
+        def run(*call_args):
+            with profiled_thread(profile):
+                return func(*call_args)
+
+        return await run_sync(run, *args, **kwargs)
+
+    run_sync_profiled.profiled = True
+    anyio.to_thread.run_sync = run_sync_profiled
+
+
+# ============================================================================
+# SQL CAPTURE
+# ============================================================================
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    if profile is not None:
+        started = conn.info["profile_query_start"].pop()
+        profile["sql"].append({
+            "statement": statement,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        })
+
+
+def install_sql_capture(engines: List):
+    """Record statements executed by profiled requests on these engines"""
+    for bind in engines:
+        # Read engines fall back to the primary engine for in-memory SQLite
+        if event.contains(bind, "before_cursor_execute", _before_cursor_execute):
+            continue
+        event.listen(bind, "before_cursor_execute", _before_cursor_execute)
+        event.listen(bind, "after_cursor_execute", _after_cursor_execute)
+
+
+# ============================================================================
+# MIDDLEWARE
+# ============================================================================
+
+def should_profile(scope) -> bool:
+    """Profile on ?profile=1 with a valid admin token, or by sampling rate"""
+    query = parse_qs(scope.get("query_string", b"").decode())
+    if query.get("profile") == ["1"] and ADMIN_TOKEN:
+        headers = dict(scope.get("headers") or [])
+        token = headers.get(b"x-admin-token", b"").decode()
+        if token and hmac.compare_digest(token, ADMIN_TOKEN):
+            return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles selected HTTP requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = {
+            "id": next(_profile_ids),
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": scope.get("query_string", b"").decode(),
+            "started_at": datetime.utcnow(),
+            "status_code": None,
+            "sql": [],
+            "samples": 0,
+            "stacks": Counter(),
+        }
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                profile["status_code"] = message["status"]
+            await send(message)
+
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        start_profile(profile)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            finish_profile(profile)
+            _current_profile.reset(token)
+            profile["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            profile["collapsed"] = [
+                f"{stack} {count}" for stack, count in profile.pop("stacks").most_common()
+            ]
+            profiles.append(profile)
+
+
+def get_profile(profile_id: int) -> Optional[dict]:
+    """Find a stored profile by id"""
+    return next((profile for profile in profiles if profile["id"] == profile_id), None)
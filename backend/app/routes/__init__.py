@@ -1,7 +1,7 @@
 from fastapi import APIRouter
 
 # Import route modules
-from app.routes import auth, routines, progress
+from app.routes import auth, routines, progress, sync, admin, session
 
 # Create API router
 api_router = APIRouter(prefix="/api/v1")
@@ -10,5 +10,8 @@ api_router = APIRouter(prefix="/api/v1")
 api_router.include_router(auth.router)
 api_router.include_router(routines.router)
 api_router.include_router(progress.router)
+api_router.include_router(sync.router)
+api_router.include_router(session.router)
+api_router.include_router(admin.router)
 
 __all__ = ["api_router"]
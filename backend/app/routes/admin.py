@@ -0,0 +1,126 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from typing import List
+
+from app.database import get_db, purge_user, Progress, ProgressSummary, Routine, User
+from app.models import Progress, ProgressSummary, Routine, User
+from app.schemas import AdminStats, BackupRequest, BackupStatus, ProfileSummary, ProfileDetail
+from app.auth import require_admin
+from app import backup, profiling
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/stats", response_model=AdminStats)
+def get_admin_stats(db: Session = Depends(get_db)):
+    """
+    Get service-wide totals
+    """
+    total_users = db.query(func.count(User.id)).scalar() or 0
+    total_routines = db.query(func.count(Routine.id)).scalar() or 0
+    
+    live_practices, live_seconds = db.query(
+        func.count(Progress.id), func.sum(Progress.completion_time)
+    ).one()
+    summary_practices, summary_seconds = db.query(
+        func.sum(ProgressSummary.session_count), func.sum(ProgressSummary.total_time)
+    ).one()
+    
+    return AdminStats(
+        total_users=total_users,
+        total_routines=total_routines,
+        total_practices=(live_practices or 0) + (summary_practices or 0),
+        total_time_minutes=((live_seconds or 0) + (summary_seconds or 0)) // 60
+    )
+
+
+@router.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+def purge_account(user_id: int, db: Session = Depends(get_db)):
+    """
+    Permanently delete a user account and all of its data
+    """
+    if not purge_user(db, user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    return None
+
+
+@router.post("/backup", response_model=BackupStatus, status_code=status.HTTP_202_ACCEPTED)
+def start_backup(request: BackupRequest, background_tasks: BackgroundTasks):
+    """
+    Start an online backup of all databases in the background
+    
+    Poll GET /admin/backup for progress and throughput.
+    """
+    try:
+        started = backup.start_background_backup(request.compress)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+    
+    if not started:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A backup is already running"
+        )
+    
+    background_tasks.add_task(backup.run_background_backup, request.compress)
+    return BackupStatus(**backup.backup_status)
+
+
+@router.get("/backup", response_model=BackupStatus)
+def get_backup_status():
+    """
+    Get progress of the running backup, or the result of the last one
+    """
+    return BackupStatus(**backup.backup_status)
+
+
+@router.get("/profiles", response_model=List[ProfileSummary])
+def list_profiles():
+    """
+    List stored request profiles, newest first
+    """
+    return [
+        ProfileSummary(**profile, sql_count=len(profile["sql"]))
+        for profile in reversed(profiling.profiles)
+    ]
+
+
+@router.get("/profiles/{profile_id}", response_model=ProfileDetail)
+def get_profile(profile_id: int):
+    """
+    Get a stored request profile with its stacks and SQL statements
+    """
+    profile = find_profile(profile_id)
+    return ProfileDetail(**profile, sql_count=len(profile["sql"]))
+
+
+@router.get("/profiles/{profile_id}/collapsed", response_class=PlainTextResponse)
+def get_profile_collapsed(profile_id: int):
+    """
+    Get a profile's collapsed stacks as text (for flamegraph.pl / speedscope)
+    """
+    return "\n".join(find_profile(profile_id)["collapsed"]) + "\n"
+
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def find_profile(profile_id: int) -> dict:
+    """Look up a stored profile or raise 404"""
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return profile
@@ -9,7 +9,7 @@ from app.auth import (
     hash_password,
     verify_password,
     create_access_token,
-    get_current_user,
+    get_current_reader,
     pwd_context
 )
 from config import ACCESS_TOKEN_EXPIRE_MINUTES
@@ -92,7 +92,7 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
 
 
 @router.get("/profile", response_model=UserResponse)
-def get_profile(current_user: User = Depends(get_current_user)):
+def get_profile(current_user: User = Depends(get_current_reader)):
     """
     Get current user profile
     """
@@ -100,7 +100,7 @@ def get_profile(current_user: User = Depends(get_current_user)):
 
 
 @router.post("/logout")
-def logout(current_user: User = Depends(get_current_user)):
+def logout(current_user: User = Depends(get_current_reader)):
     """
     User logout (token invalidation happens client-side)
     """
@@ -1,13 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import desc
 from typing import List
 from datetime import datetime, timedelta
 
-from app.database import get_db, Progress, User
+from config import PROGRESS_COMPACTION_DAYS
+from app.database import get_db, get_read_db, violates_foreign_key, Progress, User
 from app.models import Progress, User
-from app.schemas import ProgressCreate, ProgressResponse, ProgressStats
-from app.auth import get_current_user
+from app.schemas import (
+    ProgressCreate, ProgressResponse, ProgressStats, ProgressCalendar,
+    ProgressStatsBatchRequest, UserProgressStats
+)
+from app.auth import get_current_user, get_current_reader, require_admin
+from app.idempotency import IdempotentRequest, idempotent_request
+from app.analytics import BUCKETS, practice_calendar, progress_stats_for_users
+from app.routes.routines import owns_routine
+from app.routes.sync import record_tombstone
 
 router = APIRouter(prefix="/progress", tags=["Progress"])
 
@@ -16,11 +25,24 @@ router = APIRouter(prefix="/progress", tags=["Progress"])
 def log_progress(
     progress: ProgressCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency: IdempotentRequest = Depends(idempotent_request)
 ):
     """
     Log a practice session progress
+    
+    Retries that repeat an `Idempotency-Key` header get the first response back.
     """
+    replay = idempotency.replay()
+    if replay is not None:
+        return replay
+    
+    if progress.routine_id is not None and not owns_routine(db, current_user.id, progress.routine_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Routine not found"
+        )
+    
     db_progress = Progress(
         user_id=current_user.id,
         routine_id=progress.routine_id,
@@ -32,7 +54,20 @@ def log_progress(
     )
     
     db.add(db_progress)
-    db.commit()
+    try:
+        db.flush()
+        idempotency.save(status.HTTP_201_CREATED, ProgressResponse.model_validate(db_progress))
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        # Another worker may have just committed the same Idempotency-Key
+        replay = idempotency.stored_response()
+        if replay is not None:
+            return replay
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Routine not found" if violates_foreign_key(exc) else "Invalid progress data"
+        )
     db.refresh(db_progress)
     
     return db_progress
@@ -43,12 +78,21 @@ def get_progress_history(
     skip: int = 0,
     limit: int = 100,
     days: int = 30,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_reader),
+    db: Session = Depends(get_read_db)
 ):
     """
-    Get user's practice history
+    Get user's practice history.
+
+    Rows older than PROGRESS_COMPACTION_DAYS may already be rolled up
+    into summaries, so `days` cannot reach past that horizon.
     """
+    if days < 1 or days > PROGRESS_COMPACTION_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"days must be between 1 and {PROGRESS_COMPACTION_DAYS}"
+        )
+
     start_date = datetime.utcnow() - timedelta(days=days)
     
     progress_records = db.query(Progress).filter(
@@ -61,60 +105,77 @@ def get_progress_history(
 
 @router.get("/stats", response_model=ProgressStats)
 def get_progress_stats(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_reader),
+    db: Session = Depends(get_read_db)
 ):
     """
     Get user's progress statistics
     """
-    # Total practices
-    total_practices = db.query(func.count(Progress.id)).filter(
-        Progress.user_id == current_user.id
-    ).scalar() or 0
-    
-    # Total time in minutes
-    total_time_seconds = db.query(func.sum(Progress.completion_time)).filter(
-        Progress.user_id == current_user.id
-    ).scalar() or 0
-    total_time_minutes = total_time_seconds // 60
-    
-    # Completed today
-    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_end = today_start + timedelta(days=1)
-    completed_today = db.query(func.count(Progress.id)).filter(
-        (Progress.user_id == current_user.id) &
-        (Progress.is_completed == True) &
-        (Progress.practice_date >= today_start) &
-        (Progress.practice_date < today_end)
-    ).scalar() or 0
-    
-    # Favorite yogasana
-    favorite_yogasana = db.query(Progress.yogasana_name).filter(
-        Progress.user_id == current_user.id
-    ).group_by(Progress.yogasana_name).order_by(
-        func.count(Progress.id).desc()
-    ).first()
+    return progress_stats_for_users(db, [current_user.id])[current_user.id]
+
+
+@router.post(
+    "/stats/batch",
+    response_model=List[UserProgressStats],
+    dependencies=[Depends(require_admin)]
+)
+def get_progress_stats_batch(
+    request: ProgressStatsBatchRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Get progress statistics for many users at once (admin)
     
-    # Practice streak (consecutive days with practice)
-    practice_streak = calculate_practice_streak(db, current_user.id)
+    Runs a fixed number of grouped queries regardless of how many users
+    are requested. Unknown user ids are left out.
+    """
+    requested = list(dict.fromkeys(request.user_ids))
+    existing = {
+        user_id for (user_id,) in db.query(User.id).filter(User.id.in_(requested))
+    }
+    user_ids = [user_id for user_id in requested if user_id in existing]
     
-    return ProgressStats(
-        total_practices=total_practices,
-        total_time_minutes=int(total_time_minutes),
-        completed_today=completed_today,
-        favorite_yogasana=favorite_yogasana[0] if favorite_yogasana else None,
-        practice_streak=practice_streak
-    )
+    stats = progress_stats_for_users(db, user_ids)
+    
+    return [
+        UserProgressStats(user_id=user_id, **stats[user_id].model_dump())
+        for user_id in user_ids
+    ]
+
+
+@router.get("/calendar", response_model=ProgressCalendar)
+def get_progress_calendar(
+    days: int = 365,
+    bucket: str = "day",
+    current_user: User = Depends(get_current_reader),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get practice totals bucketed by day, week or month (heatmap / trends)
+    """
+    if bucket not in BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"bucket must be one of: {', '.join(BUCKETS)}"
+        )
+    
+    if days < 1 or days > 3660:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="days must be between 1 and 3660"
+        )
+    
+    return practice_calendar(db, current_user.id, days=days, bucket=bucket)
 
 
 @router.get("/routine/{routine_id}", response_model=List[ProgressResponse])
 def get_routine_progress(
     routine_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_reader),
+    db: Session = Depends(get_read_db)
 ):
     """
-    Get progress for a specific routine
+    Get progress for a specific routine (live rows only, see compaction)
     """
     progress_records = db.query(Progress).filter(
         (Progress.user_id == current_user.id) &
@@ -127,11 +188,11 @@ def get_routine_progress(
 @router.get("/yogasana/{yogasana_id}", response_model=List[ProgressResponse])
 def get_yogasana_progress(
     yogasana_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_reader),
+    db: Session = Depends(get_read_db)
 ):
     """
-    Get progress for a specific yoga pose
+    Get progress for a specific yoga pose (live rows only, see compaction)
     """
     progress_records = db.query(Progress).filter(
         (Progress.user_id == current_user.id) &
@@ -191,35 +252,9 @@ def delete_progress(
             detail="Progress record not found"
         )
     
+    record_tombstone(db, current_user.id, "progress", progress_id)
     db.delete(progress)
     db.commit()
     
     return None
 
-
-# ============================================================================
-# HELPER FUNCTIONS
-# ============================================================================
-
-def calculate_practice_streak(db: Session, user_id: int) -> int:
-    """Calculate consecutive days of practice"""
-    recent_practices = db.query(Progress).filter(
-        Progress.user_id == user_id
-    ).order_by(desc(Progress.practice_date)).limit(365).all()
-    
-    if not recent_practices:
-        return 0
-    
-    streak = 1
-    current_date = datetime.utcnow().date()
-    
-    for progress in recent_practices:
-        practice_date = progress.practice_date.date()
-        expected_date = current_date - timedelta(days=streak-1)
-        
-        if practice_date == expected_date:
-            streak += 1
-        elif practice_date < expected_date:
-            break
-    
-    return streak - 1
@@ -1,11 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from contextlib import contextmanager
 
-from app.database import get_db, Routine, User
+from app.database import get_db, get_read_db, next_change_id, violates, Routine, User
 from app.models import Routine, User
-from app.schemas import RoutineCreate, RoutineResponse, RoutineUpdate
-from app.auth import get_current_user
+from app.schemas import RoutineCreate, RoutineResponse, RoutineUpdate, RoutineBuildRequest
+from app.auth import get_current_user, get_current_reader
+from app.idempotency import IdempotentRequest, idempotent_request
+from app.routine_builder import build_routine
+from app.routes.sync import record_tombstone, record_routine_progress_tombstones
 
 router = APIRouter(prefix="/routines", tags=["Routines"])
 
@@ -14,11 +20,18 @@ router = APIRouter(prefix="/routines", tags=["Routines"])
 def create_routine(
     routine: RoutineCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency: IdempotentRequest = Depends(idempotent_request)
 ):
     """
     Create a new yoga routine
+    
+    Retries that repeat an `Idempotency-Key` header get the first response back.
     """
+    replay = idempotency.replay()
+    if replay is not None:
+        return replay
+    
     db_routine = Routine(
         user_id=current_user.id,
         title=routine.title,
@@ -28,19 +41,71 @@ def create_routine(
         duration_minutes=routine.duration_minutes
     )
     
-    db.add(db_routine)
-    db.commit()
+    # The new routine becomes the active one
+    try:
+        deactivate_other_routines(db, current_user.id)
+        db.add(db_routine)
+        db.flush()
+        idempotency.save(status.HTTP_201_CREATED, RoutineResponse.model_validate(db_routine))
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        # Another worker may have just committed the same Idempotency-Key
+        replay = idempotency.stored_response()
+        if replay is not None:
+            return replay
+        raise_integrity_error(exc)
     db.refresh(db_routine)
     
     return db_routine
 
 
+@router.post("/build", response_model=RoutineCreate)
+def build_routine_for_goal(
+    request: RoutineBuildRequest,
+    current_user: User = Depends(get_current_reader)
+):
+    """
+    Build a routine that fits the goal's candidate poses to a target duration
+    """
+    if request.target_minutes < 1 or request.target_minutes > 180:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="target_minutes must be between 1 and 180"
+        )
+    
+    if request.max_repeats < 1 or request.max_repeats > 10:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="max_repeats must be between 1 and 10"
+        )
+    
+    try:
+        return build_routine(
+            goal=request.goal,
+            target_minutes=request.target_minutes,
+            yogasana_ids=request.yogasana_ids,
+            title=request.title,
+            max_repeats=request.max_repeats
+        )
+    except KeyError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown yogasana ids: {exc.args[0]}"
+        )
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+
+
 @router.get("/", response_model=List[RoutineResponse])
 def get_routines(
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_reader),
+    db: Session = Depends(get_read_db)
 ):
     """
     Get all routines for current user
@@ -55,8 +120,8 @@ def get_routines(
 @router.get("/{routine_id}", response_model=RoutineResponse)
 def get_routine(
     routine_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_reader),
+    db: Session = Depends(get_read_db)
 ):
     """
     Get specific routine by ID
@@ -83,26 +148,27 @@ def update_routine(
 ):
     """
     Update a routine
-    """
-    routine = db.query(Routine).filter(
-        (Routine.id == routine_id) & (Routine.user_id == current_user.id)
-    ).first()
-    
-    if not routine:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Routine not found"
-        )
     
-    # Update fields
+    Pass the `version` from the last read to have the update rejected with
+    409 if the routine was changed in the meantime.
+    """
     update_data = routine_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(routine, field, value)
+    expected_version = update_data.pop("version", None)
     
-    db.commit()
-    db.refresh(routine)
+    with activation_conflicts(db):
+        if update_data.get("is_active"):
+            deactivate_other_routines(db, current_user.id, keep_id=routine_id)
+        
+        routine = update_routine_row(db, current_user.id, routine_id, update_data, expected_version)
+        
+        if routine is None:
+            db.rollback()
+            raise_missing_or_conflict(db, current_user.id, routine_id)
+        
+        response = RoutineResponse.model_validate(routine)
+        db.commit()
     
-    return routine
+    return response
 
 
 @router.delete("/{routine_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -124,6 +190,10 @@ def delete_routine(
             detail="Routine not found"
         )
     
+    record_routine_progress_tombstones(db, routine_id)
+    record_tombstone(db, current_user.id, "routine", routine_id)
+    
+    # The database cascades to progress rows (passive_deletes: nothing is loaded)
     db.delete(routine)
     db.commit()
     
@@ -139,24 +209,108 @@ def activate_routine(
     """
     Activate a routine (set as current practice routine)
     """
-    routine = db.query(Routine).filter(
-        (Routine.id == routine_id) & (Routine.user_id == current_user.id)
+    # Deactivate the others, then activate this one, in one transaction
+    with activation_conflicts(db):
+        deactivate_other_routines(db, current_user.id, keep_id=routine_id)
+        routine = update_routine_row(db, current_user.id, routine_id, {"is_active": True})
+        
+        if routine is None:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Routine not found"
+            )
+        
+        response = RoutineResponse.model_validate(routine)
+        db.commit()
+    
+    return {"message": "Routine activated successfully", "routine": response}
+
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def owns_routine(db: Session, user_id: int, routine_id: int) -> bool:
+    """Whether a routine exists and belongs to the user"""
+    return db.query(Routine.id).filter(
+        (Routine.id == routine_id) & (Routine.user_id == user_id)
+    ).first() is not None
+
+
+def deactivate_other_routines(db: Session, user_id: int, keep_id: Optional[int] = None):
+    """Deactivate the user's active routine(s), except `keep_id`"""
+    condition = (Routine.user_id == user_id) & (Routine.is_active == True)
+    if keep_id is not None:
+        condition = condition & (Routine.id != keep_id)
+    
+    db.execute(
+        update(Routine).where(condition).values(
+            is_active=False, version=Routine.version + 1, change_id=next_change_id(db, user_id)
+        ).execution_options(synchronize_session=False)
+    )
+
+
+def update_routine_row(
+    db: Session,
+    user_id: int,
+    routine_id: int,
+    values: dict,
+    expected_version: Optional[int] = None
+) -> Optional[Routine]:
+    """
+    Conditionally update a routine and bump its version in one statement.
+    
+    Returns the updated routine, or None when no row matched (missing,
+    not owned by the user, or `expected_version` is stale).
+    """
+    condition = (Routine.id == routine_id) & (Routine.user_id == user_id)
+    if expected_version is not None:
+        condition = condition & (Routine.version == expected_version)
+    
+    return db.scalars(
+        update(Routine).where(condition).values(
+            **values, version=Routine.version + 1, change_id=next_change_id(db, user_id)
+        ).returning(Routine).execution_options(populate_existing=True)
+    ).first()
+
+
+def raise_missing_or_conflict(db: Session, user_id: int, routine_id: int):
+    """Raise 404 if the routine does not exist for the user, otherwise 409"""
+    exists = db.query(Routine.id).filter(
+        (Routine.id == routine_id) & (Routine.user_id == user_id)
     ).first()
     
-    if not routine:
+    if not exists:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Routine not found"
         )
     
-    # Deactivate all other routines for this user
-    db.query(Routine).filter(
-        (Routine.user_id == current_user.id) & (Routine.is_active == True)
-    ).update({"is_active": False})
-    
-    # Activate this routine
-    routine.is_active = True
-    db.commit()
-    db.refresh(routine)
-    
-    return {"message": "Routine activated successfully", "routine": routine}
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Routine was modified by another request; reload and retry"
+    )
+
+
+@contextmanager
+def activation_conflicts(db: Session):
+    """Roll back on an IntegrityError and report it (see raise_integrity_error)"""
+    try:
+        yield
+    except IntegrityError as exc:
+        db.rollback()
+        raise_integrity_error(exc)
+
+
+def raise_integrity_error(exc: IntegrityError):
+    """Turn a concurrent activation (unique index violation) into 409, other violations into 400"""
+    if violates(exc, Routine.__table__, "uq_routines_active_per_user"):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Another routine was activated concurrently; retry"
+        )
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid routine data"
+    )
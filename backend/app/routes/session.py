@@ -0,0 +1,211 @@
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from app.database import SessionLocal, next_change_id, Progress, User
+from app.models import Progress, User
+from app.auth import decode_access_token
+from app.routes.routines import owns_routine
+from config import SESSION_IDLE_TIMEOUT_SECONDS
+
+router = APIRouter(tags=["Session"])
+
+
+class PracticeSessionBuffer:
+    """
+    In-memory state of one live practice session.
+
+    Holds the pose currently being practiced and finished poses that have
+    not been written yet. Nothing touches the database until flush().
+    """
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.routine_id: Optional[int] = None
+        self.current: Optional[dict] = None
+        self.pending: List[dict] = []
+
+    def start(self, event: dict):
+        """Begin a pose; an unfinished previous pose is recorded as not completed"""
+        if self.current is not None:
+            self.finish({"is_completed": False})
+
+        if "routine_id" in event:
+            self.routine_id = parse_routine_id(event)
+
+        self.current = {
+            "yogasana_id": str(event["yogasana_id"]),
+            "yogasana_name": str(event.get("yogasana_name") or event["yogasana_id"]),
+            "started_at": time.monotonic(),
+            "practice_date": datetime.utcnow(),
+        }
+
+    def finish(self, event: dict):
+        """Close the current pose and queue it for writing"""
+        if self.current is None:
+            raise ValueError("No pose in progress")
+
+        # Validate before touching state so a bad event keeps the pose open
+        completion_time = event.get("completion_time")
+        if completion_time is not None:
+            completion_time = int(completion_time)
+
+        pose, self.current = self.current, None
+        elapsed = int(time.monotonic() - pose["started_at"])
+
+        self.pending.append({
+            "user_id": self.user_id,
+            "routine_id": self.routine_id,
+            "yogasana_id": pose["yogasana_id"],
+            "yogasana_name": pose["yogasana_name"],
+            "completion_time": elapsed if completion_time is None else completion_time,
+            "is_completed": bool(event.get("is_completed", True)),
+            "notes": event.get("notes"),
+            "practice_date": pose["practice_date"],
+            "created_at": datetime.utcnow(),
+        })
+
+    async def flush(self) -> int:
+        """Write pending poses in a single transaction (they stay pending if it fails)"""
+        rows, self.pending = self.pending, []
+        if rows:
+            try:
+                # Shielded so a cancelled connection task still persists its poses
+                await asyncio.shield(run_in_threadpool(write_progress_rows, self.user_id, rows))
+            except Exception:
+                self.pending = rows + self.pending
+                raise
+        return len(rows)
+
+    async def close(self) -> int:
+        """Record an interrupted pose and flush everything (on disconnect)"""
+        if self.current is not None:
+            self.finish({"is_completed": False})
+        return await self.flush()
+
+
+@router.websocket("/ws/session")
+async def practice_session(websocket: WebSocket, token: Optional[str] = None):
+    """
+    Live practice session channel.
+
+    Authenticate once with `?token=<access token>`, then send JSON events:
+    `{"type": "start", "yogasana_id", "yogasana_name", "routine_id"}`,
+    `{"type": "finish", "is_completed", "completion_time", "notes"}` and
+    `{"type": "end"}`. Finished poses are written at each pose boundary;
+    an interrupted pose is saved as not completed when the socket closes.
+    If a write fails the client gets an `error` event and the poses are
+    retried with the next flush.
+    """
+    user_id = await run_in_threadpool(authenticate_token, token)
+    if user_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    buffer = PracticeSessionBuffer(user_id)
+
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    websocket.receive_text(), timeout=SESSION_IDLE_TIMEOUT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                await websocket.close(code=status.WS_1000_NORMAL_CLOSURE)
+                break
+
+            try:
+                event = json.loads(message)
+                event_type = event["type"]
+                if event_type == "start":
+                    routine_id = parse_routine_id(event)
+                    if routine_id is not None and not await run_in_threadpool(
+                        user_owns_routine, user_id, routine_id
+                    ):
+                        raise ValueError("Routine not found")
+                    buffer.start(event)
+                elif event_type == "finish":
+                    buffer.finish(event)
+                    await websocket.send_json({"type": "saved", "count": await buffer.flush()})
+                elif event_type == "end":
+                    await websocket.send_json({"type": "saved", "count": await buffer.close()})
+                    await websocket.close(code=status.WS_1000_NORMAL_CLOSURE)
+                    break
+                else:
+                    raise ValueError(f"Unknown event type: {event_type}")
+            except (ValueError, KeyError, TypeError) as exc:
+                await websocket.send_json({"type": "error", "detail": str(exc)})
+            except SQLAlchemyError:
+                await websocket.send_json({
+                    "type": "error",
+                    "detail": f"Could not save {len(buffer.pending)} pose(s); they will be retried"
+                })
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await buffer.close()
+
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def authenticate_token(token: Optional[str]) -> Optional[int]:
+    """Resolve an access token to an active user's id (None if invalid)"""
+    token_data = decode_access_token(token) if token else None
+    if token_data is None:
+        return None
+
+    db = SessionLocal()
+    try:
+        user = db.query(User.id, User.is_active).filter(
+            User.username == token_data.username
+        ).first()
+    finally:
+        db.close()
+
+    if user is None or not user.is_active:
+        return None
+    return user.id
+
+
+def parse_routine_id(event: dict) -> Optional[int]:
+    """Routine id of a start event (None when the pose is not part of a routine)"""
+    routine_id = event.get("routine_id")
+    return None if routine_id is None else int(routine_id)
+
+
+def user_owns_routine(user_id: int, routine_id: int) -> bool:
+    """Whether a routine belongs to the user (checked before a pose is linked to it)"""
+    db = SessionLocal()
+    try:
+        return owns_routine(db, user_id, routine_id)
+    finally:
+        db.close()
+
+
+def write_progress_rows(user_id: int, rows: List[dict]):
+    """Insert buffered progress rows for a user in one transaction"""
+    db = SessionLocal()
+    db.info["user_id"] = user_id
+    try:
+        try:
+            change_id = next_change_id(db, user_id)
+            db.execute(insert(Progress), [{**row, "change_id": change_id} for row in rows])
+            db.commit()
+        except IntegrityError:
+            # Unknown or deleted routine: keep the practice, drop the link
+            db.rollback()
+            change_id = next_change_id(db, user_id)
+            db.execute(insert(Progress), [{**row, "routine_id": None, "change_id": change_id} for row in rows])
+            db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,111 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import insert, literal, select
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional
+
+from app.database import get_db, next_change_id, ChangeCounter, Progress, Routine, Tombstone, User
+from app.models import ChangeCounter, Progress, Routine, Tombstone, User
+from app.schemas import SyncResponse
+from app.auth import get_current_user
+
+router = APIRouter(prefix="/sync", tags=["Sync"])
+
+
+@router.get("", response_model=SyncResponse)
+def sync_changes(
+    since: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get routines and progress changed since the last sync token
+
+    Without a token, or with one from before the last tombstone purge,
+    the response is a full snapshot (`full: true`). Otherwise it holds
+    rows created or updated since the token plus ids deleted since then.
+    Rows written while the sync runs may repeat next time; clients merge by id.
+    """
+    # Read the counter before the rows: anything committed later gets a
+    # higher change id and is picked up by the next sync
+    counter = db.query(ChangeCounter.change_id, ChangeCounter.purged_change_id).filter(
+        ChangeCounter.user_id == current_user.id
+    ).first()
+    latest, purged = counter if counter is not None else (0, 0)
+    since_id = decode_sync_token(since) if since else None
+
+    # Tokens not issued by this database (e.g. after a restore) also resync
+    full = since_id is None or since_id < purged or since_id > latest
+
+    routines = db.query(Routine).filter(Routine.user_id == current_user.id)
+    progress = db.query(Progress).filter(Progress.user_id == current_user.id)
+    deleted_routines, deleted_progress = [], []
+
+    if not full:
+        routines = routines.filter(Routine.change_id > since_id)
+        progress = progress.filter(Progress.change_id > since_id)
+
+        tombstones = db.query(Tombstone.entity, Tombstone.entity_id).filter(
+            (Tombstone.user_id == current_user.id) &
+            (Tombstone.change_id > since_id)
+        ).all()
+        deleted_routines = [entity_id for entity, entity_id in tombstones if entity == "routine"]
+        deleted_progress = [entity_id for entity, entity_id in tombstones if entity == "progress"]
+
+    return SyncResponse(
+        token=encode_sync_token(latest),
+        full=full,
+        routines=routines.order_by(Routine.id).all(),
+        progress=progress.order_by(Progress.id).all(),
+        deleted_routines=deleted_routines,
+        deleted_progress=deleted_progress
+    )
+
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def encode_sync_token(change_id: int) -> str:
+    """Opaque sync token for a change id"""
+    return str(change_id)
+
+
+def decode_sync_token(token: str) -> int:
+    """Parse a sync token back into a change id"""
+    try:
+        return int(token)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sync token"
+        )
+
+
+def record_tombstone(db: Session, user_id: int, entity: str, entity_id: int):
+    """Record that a routine or progress row was deleted"""
+    db.add(Tombstone(user_id=user_id, entity=entity, entity_id=entity_id))
+
+
+def record_routine_progress_tombstones(db: Session, routine_id: int):
+    """
+    Record deletions of a routine's progress rows before the cascade removes them
+
+    Each owner's rows are tombstoned under that owner's change id so every
+    affected user's next sync sees the deletion. One INSERT ... SELECT per owner.
+    """
+    owner_ids = db.scalars(
+        select(Progress.user_id).where(Progress.routine_id == routine_id).distinct().order_by(Progress.user_id)
+    ).all()
+    for owner_id in owner_ids:
+        db.execute(
+            insert(Tombstone).from_select(
+                ["user_id", "entity", "entity_id", "change_id", "deleted_at"],
+                select(
+                    Progress.user_id, literal("progress"), Progress.id,
+                    literal(next_change_id(db, owner_id)), literal(datetime.utcnow())
+                ).where(
+                    (Progress.user_id == owner_id) & (Progress.routine_id == routine_id)
+                )
+            )
+        )
@@ -0,0 +1,173 @@
+"""
+Server-side routine builder.
+
+Fits a goal's candidate poses to a target session length. Catalog
+durations ("30 seconds", "1 minute") are parsed into seconds once, when
+the catalog is loaded; the pose selection is a bounded knapsack solved
+with a vectorized dynamic program over 5-second time slots.
+"""
+import json
+import re
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from config import YOGASANA_CATALOG_PATH
+from app.schemas import RoutineCreate
+
+# Time resolution of the knapsack (seconds per slot)
+SLOT_SECONDS = 5
+
+DEFAULT_POSE_SECONDS = 30
+
+UNIT_SECONDS = {
+    "s": 1, "sec": 1, "secs": 1, "second": 1, "seconds": 1,
+    "m": 60, "min": 60, "mins": 60, "minute": 60, "minutes": 60,
+    "h": 3600, "hr": 3600, "hour": 3600, "hours": 3600,
+}
+
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(?:-\s*\d+(?:\.\d+)?\s*)?([a-zA-Z]+)")
+
+
+class CatalogPose(NamedTuple):
+    """A catalog pose with its suggested duration parsed into seconds"""
+    id: str
+    name: str
+    duration_seconds: int
+
+
+# ============================================================================
+# CATALOG LOADING
+# ============================================================================
+
+def parse_duration(text: Optional[str]) -> int:
+    """Parse a free-text duration such as "30 seconds" or "1-2 minutes" into seconds"""
+    match = DURATION_PATTERN.search(text or "")
+    if not match or match.group(2).lower() not in UNIT_SECONDS:
+        return DEFAULT_POSE_SECONDS
+    return max(1, int(float(match.group(1)) * UNIT_SECONDS[match.group(2).lower()]))
+
+
+def parse_catalog(entries: List[dict]) -> Dict[str, CatalogPose]:
+    """Build the id -> CatalogPose lookup from raw catalog entries"""
+    return {
+        entry["id"]: CatalogPose(
+            id=entry["id"],
+            name=entry.get("name", entry["id"]),
+            duration_seconds=parse_duration(entry.get("suggested_Duration"))
+        )
+        for entry in entries
+    }
+
+
+@lru_cache(maxsize=None)
+def load_catalog(path: str = YOGASANA_CATALOG_PATH) -> Dict[str, CatalogPose]:
+    """Load and parse the yogasana catalog (cached after the first call)"""
+    with open(path, encoding="utf-8") as catalog_file:
+        return parse_catalog(json.load(catalog_file)["yogasanas"])
+
+
+# ============================================================================
+# POSE SELECTION
+# ============================================================================
+
+def select_poses(poses: List[CatalogPose], target_seconds: int, max_repeats: int = 2) -> List[int]:
+    """
+    Choose how many times to hold each pose so the total fits the target.
+
+    Maximizes the filled time first and the number of distinct poses second.
+    The first hold of each pose is its own 0/1 item carrying the "distinct"
+    bonus; further holds are binary-split into 1, 2, 4, ... bundles, which
+    keeps the item count at O(n log max_repeats). Returns a count per pose.
+    """
+    capacity = target_seconds // SLOT_SECONDS
+    if capacity <= 0 or not poses:
+        return [0] * len(poses)
+
+    # Lexicographic objective: one slot of time outweighs every distinct bonus
+    scale = len(poses) + 1
+
+    items = []  # (pose index, holds, slots, value)
+    for index, pose in enumerate(poses):
+        slots = max(1, -(-pose.duration_seconds // SLOT_SECONDS))
+        items.append((index, 1, slots, slots * scale + 1))
+        remaining, bundle = max_repeats - 1, 1
+        while remaining > 0:
+            holds = min(bundle, remaining)
+            items.append((index, holds, slots * holds, slots * holds * scale))
+            remaining -= holds
+            bundle *= 2
+
+    # best[c] = best value using at most c slots; taken[i, c] records choices
+    best = np.zeros(capacity + 1, dtype=np.int64)
+    taken = np.zeros((len(items), capacity + 1), dtype=bool)
+    for i, (_, _, slots, value) in enumerate(items):
+        if slots > capacity:
+            continue
+        candidate = best[:-slots] + value
+        improved = candidate > best[slots:]
+        taken[i, slots:] = improved
+        best[slots:] = np.where(improved, candidate, best[slots:])
+
+    counts = [0] * len(poses)
+    remaining_slots = capacity
+    for i in range(len(items) - 1, -1, -1):
+        if taken[i, remaining_slots]:
+            index, holds, slots, _ = items[i]
+            counts[index] += holds
+            remaining_slots -= slots
+
+    return counts
+
+
+def balanced_sequence(poses: List[CatalogPose], counts: List[int]) -> List[CatalogPose]:
+    """Order selected holds in rounds so repeats of a pose are spread out"""
+    sequence = []
+    for round_number in range(max(counts, default=0)):
+        sequence.extend(
+            pose for pose, count in zip(poses, counts) if count > round_number
+        )
+    return sequence
+
+
+def build_routine(
+    goal: str,
+    target_minutes: int,
+    yogasana_ids: Optional[List[str]] = None,
+    title: Optional[str] = None,
+    max_repeats: int = 2,
+    catalog: Optional[Dict[str, CatalogPose]] = None
+) -> RoutineCreate:
+    """
+    Build a routine for a goal that fits within `target_minutes`.
+
+    `yogasana_ids` are the goal's candidate poses (e.g. the recommendations
+    shown in Configure mode); the whole catalog is used when omitted.
+    Raises KeyError for ids missing from the catalog and ValueError when
+    no candidate fits the target.
+    """
+    catalog = load_catalog() if catalog is None else catalog
+    ids = list(dict.fromkeys(yogasana_ids)) if yogasana_ids else list(catalog)
+
+    missing = [yogasana_id for yogasana_id in ids if yogasana_id not in catalog]
+    if missing:
+        raise KeyError(", ".join(missing))
+
+    poses = [catalog[yogasana_id] for yogasana_id in ids]
+    counts = select_poses(poses, target_minutes * 60, max_repeats)
+    sequence = balanced_sequence(poses, counts)
+    if not sequence:
+        raise ValueError("No candidate pose fits within the target duration")
+
+    total_seconds = sum(pose.duration_seconds for pose in sequence)
+    return RoutineCreate(
+        title=title or f"{goal} ({target_minutes} min)",
+        goal=goal,
+        description=(
+            f"{len(sequence)} holds of {sum(1 for count in counts if count)} poses, "
+            f"{total_seconds // 60} min {total_seconds % 60} s"
+        ),
+        yogasana_ids=json.dumps([pose.id for pose in sequence]),
+        duration_minutes=max(1, round(total_seconds / 60))
+    )
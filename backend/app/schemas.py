@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime
 
 
 # ============================================================================
@@ -61,6 +61,15 @@ class RoutineCreate(RoutineBase):
     pass
 
 
+class RoutineBuildRequest(BaseModel):
+    """Routine builder request schema"""
+    goal: str
+    target_minutes: int
+    yogasana_ids: Optional[List[str]] = None  # Candidate poses; whole catalog if omitted
+    title: Optional[str] = None
+    max_repeats: int = 2  # Maximum holds of the same pose
+
+
 class RoutineUpdate(BaseModel):
     """Routine update schema"""
     title: Optional[str] = None
@@ -69,6 +78,7 @@ class RoutineUpdate(BaseModel):
     yogasana_ids: Optional[str] = None
     duration_minutes: Optional[int] = None
     is_active: Optional[bool] = None
+    version: Optional[int] = None  # Expected current version; 409 if it has changed
 
 
 class RoutineResponse(RoutineBase):
@@ -76,6 +86,7 @@ class RoutineResponse(RoutineBase):
     id: int
     user_id: int
     is_active: bool
+    version: int
     created_at: datetime
     updated_at: datetime
 
@@ -113,6 +124,7 @@ class ProgressResponse(ProgressBase):
     routine_id: Optional[int]
     practice_date: datetime
     created_at: datetime
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -127,6 +139,107 @@ class ProgressStats(BaseModel):
     practice_streak: int = 0
 
 
+class ProgressStatsBatchRequest(BaseModel):
+    """Users to compute progress statistics for (coach/admin dashboards)"""
+    user_ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+
+class UserProgressStats(ProgressStats):
+    """Progress statistics of one user in a batch"""
+    user_id: int
+
+
+class ProgressCalendar(BaseModel):
+    """Bucketed practice totals for calendar heatmaps and trend lines"""
+    bucket: str  # day, week or month
+    start_date: date
+    end_date: date
+    labels: List[date]  # first day of each bucket
+    sessions: List[int]
+    completed: List[int]
+    time_seconds: List[int]
+
+
+# ============================================================================
+# SYNC SCHEMAS
+# ============================================================================
+
+class SyncResponse(BaseModel):
+    """Changes since a sync token"""
+    token: str  # Pass as `since` on the next sync
+    full: bool  # True when the client must replace its local copy
+    routines: List[RoutineResponse]
+    progress: List[ProgressResponse]
+    deleted_routines: List[int]
+    deleted_progress: List[int]
+
+
+# ============================================================================
+# ADMIN SCHEMAS
+# ============================================================================
+
+class AdminStats(BaseModel):
+    """Service-wide totals"""
+    total_users: int
+    total_routines: int
+    total_practices: int
+    total_time_minutes: int
+
+
+class BackupRequest(BaseModel):
+    """Options for an online backup started from the admin API"""
+    compress: bool = True
+
+
+class BackupFile(BaseModel):
+    """One database snapshot written by a backup"""
+    database: str  # "main"
+    path: str
+    bytes: int
+    compressed_bytes: Optional[int] = None
+    pages: int
+    steps: int
+    restarts: int  # copies restarted because a writer changed the source
+    seconds: float
+    mb_per_second: Optional[float] = None
+
+
+class BackupStatus(BaseModel):
+    """State of the most recent admin-triggered backup"""
+    running: bool
+    compressed: Optional[bool] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    current: Optional[dict] = None  # database, pages_copied, pages_total, mb_per_second
+    databases: List[BackupFile] = []
+    error: Optional[str] = None
+
+
+class ProfileSummary(BaseModel):
+    """Stored request profile (listing)"""
+    id: int
+    method: str
+    path: str
+    query: str
+    started_at: datetime
+    status_code: Optional[int] = None
+    duration_ms: float
+    samples: int
+    sql_count: int
+
+
+class SqlStatement(BaseModel):
+    """SQL statement executed during a profiled request"""
+    statement: str
+    duration_ms: float
+
+
+class ProfileDetail(ProfileSummary):
+    """Stored request profile with collapsed stacks and SQL"""
+    collapsed: List[str]  # "frame;frame;frame count" lines
+    sql: List[SqlStatement]
+
+
 # ============================================================================
 # TOKEN SCHEMAS
 # ============================================================================
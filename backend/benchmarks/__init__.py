@@ -0,0 +1 @@
+"""Benchmark scripts - run from the backend directory, e.g. `python -m benchmarks.bench_calendar`"""
@@ -0,0 +1,75 @@
+"""
+Benchmark online backups while a writer keeps committing.
+
+Compares copying the whole database in one backup step (the writer waits
+for the full copy) with small incremental steps and pauses. Reports the
+writer's worst commit latency and how often the copy restarted.
+
+    python -m benchmarks.bench_backup [rows] [write_interval_ms]
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from app.backup import backup_database
+from benchmarks.common import make_session, seed_user, timed
+
+
+def run_with_writer(path: str, interval: float, backup):
+    """Run `backup` while a second connection commits every `interval` seconds"""
+    latencies = []
+    done = threading.Event()
+
+    def writer():
+        connection = sqlite3.connect(path, timeout=60)
+        while not done.is_set():
+            started = time.perf_counter()
+            connection.execute(
+                "INSERT INTO tombstones (user_id, entity, entity_id, change_id, deleted_at) "
+                "VALUES (1, 'progress', 0, 0, CURRENT_TIMESTAMP)"
+            )
+            connection.commit()
+            latencies.append(time.perf_counter() - started)
+            time.sleep(interval)
+        connection.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        result = backup()
+    finally:
+        done.set()
+        thread.join()
+
+    if not latencies:
+        raise RuntimeError("the writer committed nothing during the backup")
+    latencies.sort()
+    print(
+        f"{'  writer commits / p99 / max':<40} {len(latencies):>6} / "
+        f"{latencies[int(len(latencies) * 0.99)] * 1000:.1f} / {latencies[-1] * 1000:.1f} ms"
+    )
+    print(f"{'  steps / restarts':<40} {result['steps']:>6} / {result['restarts']}")
+
+
+def main(rows: int = 100_000, interval_ms: float = 20):
+    db = make_session()
+    seed_user(db, rows=rows)
+    path = db.get_bind().url.database
+    db.close()
+    destination = os.path.join(os.path.dirname(path), "snapshot.db")
+    print(f"{rows} progress rows, {os.path.getsize(path) / 2**20:.1f} MiB, write every {interval_ms} ms")
+
+    for label, pages, pause_ms in (("single step", -1, 0), ("256 pages, 50 ms pause", 256, 50), ("64 pages, 5 ms pause", 64, 5)):
+        if os.path.exists(destination):
+            os.remove(destination)
+        with timed(label):
+            run_with_writer(path, interval_ms / 1000, lambda: backup_database(path, destination, pages, pause_ms))
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    )
@@ -0,0 +1,46 @@
+"""
+Benchmark the vectorized calendar endpoint against a per-row ORM loop.
+
+    python -m benchmarks.bench_calendar [rows]
+"""
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from app.analytics import practice_calendar
+from app.database import Progress
+from benchmarks.common import make_session, seed_user, timed
+
+
+def orm_loop_calendar(db, user_id: int, days: int):
+    """Reference implementation: load ORM rows and bucket them in Python"""
+    start = datetime.utcnow().date() - timedelta(days=days - 1)
+    totals = defaultdict(lambda: [0, 0, 0])
+    for progress in db.query(Progress).filter(
+        (Progress.user_id == user_id) &
+        (Progress.practice_date >= datetime.combine(start, datetime.min.time()))
+    ).all():
+        bucket = totals[progress.practice_date.date()]
+        bucket[0] += 1
+        bucket[1] += int(bool(progress.is_completed))
+        bucket[2] += progress.completion_time or 0
+    return totals
+
+
+def main(rows: int = 100_000):
+    db = make_session()
+    user_id = seed_user(db, rows=rows)
+    print(f"{rows} progress rows")
+
+    with timed("ORM row loop (day, 365)"):
+        orm_loop_calendar(db, user_id, 365)
+    db.expunge_all()
+
+    for bucket in ("day", "week", "month"):
+        with timed(f"vectorized ({bucket}, 365)"):
+            result = practice_calendar(db, user_id, days=365, bucket=bucket)
+    print(f"total sessions in window: {sum(result['sessions'])}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
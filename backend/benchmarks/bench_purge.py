@@ -0,0 +1,45 @@
+"""
+Benchmark purging a user via ON DELETE CASCADE against an ORM delete loop.
+
+    python -m benchmarks.bench_purge [rows]
+"""
+import sys
+import tracemalloc
+
+from app.database import purge_user, Progress, ProgressSummary, Routine, Tombstone, User
+from benchmarks.common import make_session, seed_user, timed
+
+
+def orm_loop_purge(db, user_id: int):
+    """Reference implementation: load every owned row and delete it one by one"""
+    for model in (Progress, ProgressSummary, Tombstone, Routine):
+        for row in db.query(model).filter(model.user_id == user_id).all():
+            db.delete(row)
+    db.delete(db.get(User, user_id))
+    db.commit()
+
+
+def measure(label: str, purge, rows: int):
+    db = make_session()
+    user_id = seed_user(db, rows=rows)
+    db.expunge_all()
+
+    tracemalloc.start()
+    with timed(label):
+        purge(db, user_id)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{'  peak Python memory':<40} {peak / 2**20:10.1f} MiB")
+
+    assert db.query(Progress).count() == 0
+    db.close()
+
+
+def main(rows: int = 100_000):
+    print(f"{rows} progress rows")
+    measure("ORM load + delete loop", orm_loop_purge, rows)
+    measure("DELETE ... ON DELETE CASCADE", purge_user, rows)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,109 @@
+"""
+Benchmark reads under a concurrent writer: a shared read-write pool with the
+rollback journal, the same shared pool on a WAL database, and the WAL
+database with a separate read-only pool. The middle case separates the
+effect of WAL from the effect of splitting the pool.
+
+    python -m benchmarks.bench_read_pool [rows] [seconds] [readers]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.analytics import progress_stats_for_users
+from app.database import Base, Progress, make_engine, make_read_engine
+from benchmarks.common import seed_user
+
+
+def run(write_engine, read_engine, user_id: int, seconds: float, readers: int):
+    """Hammer the database with one writer and `readers` stats readers"""
+    deadline = time.monotonic() + seconds
+    read_latencies, write_latencies, errors = [], [], [0]
+
+    def writer():
+        with write_engine.connect() as connection:
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    connection.execute(insert(Progress), [{
+                        "user_id": user_id, "yogasana_id": "bench", "yogasana_name": "Bench",
+                        "completion_time": 30, "is_completed": True, "practice_date": datetime.utcnow(),
+                    }])
+                    connection.commit()
+                    write_latencies.append(time.perf_counter() - started)
+                except OperationalError:
+                    connection.rollback()
+                    errors[0] += 1
+
+    def reader():
+        ReadSession = sessionmaker(bind=read_engine)
+        while time.monotonic() < deadline:
+            db = ReadSession()
+            started = time.perf_counter()
+            try:
+                progress_stats_for_users(db, [user_id])
+                read_latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                errors[0] += 1
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for label, latencies in (("reads", read_latencies), ("writes", write_latencies)):
+        latencies.sort()
+        if latencies:
+            print(
+                f"  {label:<8} {len(latencies):>7} done, p50 {latencies[len(latencies) // 2] * 1000:7.1f} ms, "
+                f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.1f} ms"
+            )
+    print(f"  {'locked':<8} {errors[0]:>7} errors")
+
+
+def make_database(directory: str, name: str, rows: int):
+    """Seed a database file and return its path and user id"""
+    path = os.path.join(directory, name)
+    seed_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=seed_engine)
+    user_id = seed_user(sessionmaker(bind=seed_engine)(), rows=rows)
+    seed_engine.dispose()
+    return path, user_id
+
+
+def main(rows: int = 50_000, seconds: float = 5, readers: int = 4):
+    directory = tempfile.mkdtemp(prefix="wellness-bench-")
+    print(f"{rows} progress rows, {readers} readers, 1 writer, {seconds} s each")
+
+    path, user_id = make_database(directory, "shared.db", rows)
+    shared = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 5})
+    print("shared pool, rollback journal")
+    run(shared, shared, user_id, seconds, readers)
+
+    path, user_id = make_database(directory, "shared-wal.db", rows)
+    shared_wal = make_engine(f"sqlite:///{path}")
+    print("shared pool, WAL")
+    run(shared_wal, shared_wal, user_id, seconds, readers)
+
+    path, user_id = make_database(directory, "split.db", rows)
+    primary = make_engine(f"sqlite:///{path}")
+    print("primary + read-only pool, WAL")
+    run(primary, make_read_engine(f"sqlite:///{path}"), user_id, seconds, readers)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 50_000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 5,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    )
@@ -0,0 +1,40 @@
+"""
+Benchmark the routine builder on a large synthetic catalog.
+
+    python -m benchmarks.bench_routine_builder [poses]
+"""
+import random
+import sys
+
+from app.routine_builder import build_routine, parse_catalog
+from benchmarks.common import timed
+
+DURATIONS = ["20 seconds", "30 seconds", "45 seconds", "60 seconds", "1 minute", "90 seconds", "2 minutes"]
+
+
+def synthetic_catalog(poses: int):
+    return [
+        {"id": f"pose-{i}", "name": f"Pose {i}", "suggested_Duration": random.choice(DURATIONS)}
+        for i in range(poses)
+    ]
+
+
+def main(poses: int = 5000):
+    entries = synthetic_catalog(poses)
+    with timed(f"parse catalog ({poses} poses)"):
+        catalog = parse_catalog(entries)
+
+    candidates = random.sample(list(catalog), min(poses, 300))
+    for minutes in (15, 30, 60):
+        with timed(f"300 candidates, {minutes} min"):
+            routine = build_routine("Flexibility", minutes, candidates, catalog=catalog)
+    print(f"  -> {routine.duration_minutes} min, {routine.description}")
+
+    for minutes in (30, 60):
+        with timed(f"{poses} candidates, {minutes} min"):
+            routine = build_routine("Flexibility", minutes, catalog=catalog)
+    print(f"  -> {routine.duration_minutes} min, {routine.description}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
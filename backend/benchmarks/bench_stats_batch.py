@@ -0,0 +1,37 @@
+"""
+Benchmark batched progress stats against one stats call per user.
+
+    python -m benchmarks.bench_stats_batch [users] [rows_per_user]
+"""
+import sys
+
+from sqlalchemy import event
+
+from app.analytics import progress_stats_for_users
+from benchmarks.common import make_session, seed_user, timed
+
+
+def main(users: int = 50, rows: int = 2_000):
+    db = make_session()
+    user_ids = [seed_user(db, rows=rows, days=120, username=f"bench{i}") for i in range(users)]
+    print(f"{users} users x {rows} progress rows")
+
+    queries = [0]
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: queries.__setitem__(0, queries[0] + 1))
+
+    with timed("one stats call per user"):
+        for user_id in user_ids:
+            progress_stats_for_users(db, [user_id])
+    print(f"{'  queries':<40} {queries[0]:10}")
+
+    queries[0] = 0
+    with timed("batched (GROUP BY user_id)"):
+        progress_stats_for_users(db, user_ids)
+    print(f"{'  queries':<40} {queries[0]:10}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    )
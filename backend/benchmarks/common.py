@@ -0,0 +1,58 @@
+"""Shared helpers for benchmark scripts"""
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, User, Progress, make_engine
+
+
+def make_session(path: str = None):
+    """Create a fresh SQLite database in a temp file and return a session"""
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="wellness-bench-"), "bench.db")
+    engine = make_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+
+def seed_user(db, rows: int = 100_000, days: int = 730, username: str = "bench") -> int:
+    """Insert a user with `rows` progress rows spread over the last `days` days"""
+    user = User(email=f"{username}@example.com", username=username, hashed_password="x")
+    db.add(user)
+    db.commit()
+
+    now = datetime.utcnow()
+    poses = [f"pose-{i}" for i in range(40)]
+    batch = []
+    for _ in range(rows):
+        pose = random.choice(poses)
+        batch.append({
+            "user_id": user.id,
+            "yogasana_id": pose,
+            "yogasana_name": pose.title(),
+            "completion_time": random.randint(20, 120),
+            "is_completed": random.random() < 0.8,
+            "practice_date": now - timedelta(seconds=random.randint(0, days * 86400)),
+            "created_at": now,
+        })
+        if len(batch) == 10_000:
+            db.execute(insert(Progress), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Progress), batch)
+    db.commit()
+    return user.id
+
+
+@contextmanager
+def timed(label: str):
+    """Print the wall-clock time of the enclosed block"""
+    start = time.perf_counter()
+    yield
+    print(f"{label:<40} {(time.perf_counter() - start) * 1000:10.1f} ms")
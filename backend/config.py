@@ -7,6 +7,56 @@ load_dotenv()
 # Database
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./wellness_guide.db")
 
+# Read-only endpoints use a separate read-only connection pool: SQLite files
+# are reopened read-only, server databases can point at a replica. After a
+# user's own write their reads stay on the primary for READ_STICKY_SECONDS.
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL", "")
+READ_POOL_SIZE = int(os.getenv("READ_POOL_SIZE", "10"))
+READ_STICKY_SECONDS = float(os.getenv("READ_STICKY_SECONDS", "5"))
+
+
+# Progress compaction: rows older than this many days are rolled up into
+# per-day summaries and archived to gzipped JSON Lines files
+PROGRESS_COMPACTION_DAYS = int(os.getenv("PROGRESS_COMPACTION_DAYS", "90"))
+PROGRESS_ARCHIVE_DIR = os.getenv("PROGRESS_ARCHIVE_DIR", "./archive")
+
+# Online backups: pages copied per backup step and the pause between steps
+# (writers can take the database lock during the pause)
+BACKUP_DIR = os.getenv("BACKUP_DIR", "./backups")
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+BACKUP_STEP_PAUSE_MS = float(os.getenv("BACKUP_STEP_PAUSE_MS", "50"))
+
+# Yogasana catalog shared with the frontend
+YOGASANA_CATALOG_PATH = os.getenv(
+    "YOGASANA_CATALOG_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "data", "yogasanas.json")
+)
+
+# Delta sync: tombstones older than the retention are purged and tokens from
+# before the purge get a full resync
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "30"))
+
+# Live practice sessions (/ws/session) are closed after this much silence
+SESSION_IDLE_TIMEOUT_SECONDS = int(os.getenv("SESSION_IDLE_TIMEOUT_SECONDS", "1800"))
+
+# Idempotency-Key support for POST /progress/ and POST /routines/: stored
+# responses cached per worker, how long duplicates wait for an in-flight
+# original (a waiting duplicate holds a threadpool worker, so at most 5 s),
+# and how long keys are kept (purged by compaction)
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_WAIT_SECONDS = min(float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "2")), 5.0)
+IDEMPOTENCY_KEY_RETENTION_HOURS = int(os.getenv("IDEMPOTENCY_KEY_RETENTION_HOURS", "24"))
+
+# Admin API (X-Admin-Token header); disabled when empty
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Request profiling. When enabled, admins can profile a request with
+# ?profile=1 and a fraction of all requests can be sampled
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+PROFILE_MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", "50"))
+
 # JWT Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
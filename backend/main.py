@@ -2,8 +2,8 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-from config import PROJECT_NAME, PROJECT_VERSION, ALLOWED_ORIGINS, API_V1_STR
-from app.database import init_db
+from config import PROJECT_NAME, PROJECT_VERSION, ALLOWED_ORIGINS, API_V1_STR, PROFILING_ENABLED
+from app.database import init_db, engine, read_engine
 from app.routes import api_router
 
 # Initialize database
@@ -25,6 +25,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in request profiling (not installed at all when disabled)
+if PROFILING_ENABLED:
+    from app.profiling import ProfilingMiddleware, install_sql_capture, install_thread_tracking
+    install_sql_capture([engine, read_engine])
+    install_thread_tracking()
+    app.add_middleware(ProfilingMiddleware)
+
 # Include API routes
 app.include_router(api_router)
 
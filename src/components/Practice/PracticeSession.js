@@ -1,18 +1,39 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import { loadRoutine } from "../../services/storageService";
 import { getYogasanaById } from "../../services/yogasanaService";
+import { openPracticeSession } from "../../services/apiService";
 import Timer from "./Timer";
 
 function PracticeSession() {
   const [routine, setRoutine] = useState(null);
   const [currentIndex, setCurrentIndex] = useState(0);
   const [isComplete, setIsComplete] = useState(false);
+  const sessionRef = useRef(null);
 
   useEffect(() => {
     const savedRoutine = loadRoutine();
     setRoutine(savedRoutine);
   }, []);
 
+  // Live session channel: progress is saved server-side per pose
+  useEffect(() => {
+    sessionRef.current = openPracticeSession();
+    return () => {
+      if (sessionRef.current) {
+        sessionRef.current.close();
+        sessionRef.current = null;
+      }
+    };
+  }, []);
+
+  // Report each pose as it starts
+  useEffect(() => {
+    if (!routine || isComplete || !sessionRef.current) return;
+    const item = routine.selectedYogasanas[currentIndex];
+    const pose = getYogasanaById(item.yogasana);
+    sessionRef.current.startPose(item.yogasana, pose ? pose.name : item.yogasana);
+  }, [routine, currentIndex, isComplete]);
+
   // If no routine exists
   if (!routine) {
     return (
@@ -35,7 +56,14 @@ function PracticeSession() {
 
   // 2–5. Handle next button logic
   function handleNext() {
+    if (sessionRef.current) {
+      sessionRef.current.finishPose(true);
+    }
+
     if (currentIndex + 1 >= routine.selectedYogasanas.length) {
+      if (sessionRef.current) {
+        sessionRef.current.end();
+      }
       setIsComplete(true);
     } else {
       setCurrentIndex(currentIndex + 1);
@@ -3,8 +3,49 @@
  * Includes authentication, routines, and progress tracking
  */
 
+import { loadSyncState, applySyncDelta, clearSyncState } from "./storageService";
+
 const API_BASE_URL = process.env.REACT_APP_API_URL || "http://localhost:8000/api/v1";
 
+const WRITE_RETRY_ATTEMPTS = 3;
+
+// ============================================================================
+// REQUEST HELPERS
+// ============================================================================
+
+/**
+ * Generate a unique Idempotency-Key
+ */
+function newIdempotencyKey() {
+  if (window.crypto && window.crypto.randomUUID) {
+    return window.crypto.randomUUID();
+  }
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+/**
+ * POST with retries on network errors, 409 and 5xx responses
+ * Every attempt carries the same Idempotency-Key, so the server applies
+ * the write once and answers retries with the stored response (409 means
+ * the first attempt is still running or lost a race; retrying is safe).
+ */
+async function postWithRetry(url, options) {
+  const headers = { ...options.headers, "Idempotency-Key": newIdempotencyKey() };
+
+  for (let attempt = 1; ; attempt++) {
+    try {
+      const response = await fetch(url, { ...options, method: "POST", headers });
+      const retryable = response.status >= 500 || response.status === 409;
+      if (!retryable || attempt === WRITE_RETRY_ATTEMPTS) {
+        return response;
+      }
+    } catch (error) {
+      if (attempt === WRITE_RETRY_ATTEMPTS) throw error;
+    }
+    await new Promise((resolve) => setTimeout(resolve, 500 * 2 ** (attempt - 1)));
+  }
+}
+
 // ============================================================================
 // AUTHENTICATION FUNCTIONS
 // ============================================================================
@@ -88,6 +129,7 @@ export async function getProfile() {
 export function logout() {
   localStorage.removeItem("token");
   localStorage.removeItem("user");
+  clearSyncState();
 }
 
 /**
@@ -116,8 +158,7 @@ export async function createRoutine(title, goal, yogasanaIds, duration, descript
   const token = localStorage.getItem("token");
   if (!token) throw new Error("Not authenticated");
 
-  const response = await fetch(`${API_BASE_URL}/routines/`, {
-    method: "POST",
+  const response = await postWithRetry(`${API_BASE_URL}/routines/`, {
     headers: {
       "Content-Type": "application/json",
       Authorization: `Bearer ${token}`,
@@ -275,8 +316,7 @@ export async function logProgress(
   const token = localStorage.getItem("token");
   if (!token) throw new Error("Not authenticated");
 
-  const response = await fetch(`${API_BASE_URL}/progress/`, {
-    method: "POST",
+  const response = await postWithRetry(`${API_BASE_URL}/progress/`, {
     headers: {
       "Content-Type": "application/json",
       Authorization: `Bearer ${token}`,
@@ -441,3 +481,88 @@ export async function deleteProgress(progressId) {
 
   return true;
 }
+
+// ============================================================================
+// SYNC FUNCTIONS
+// ============================================================================
+
+/**
+ * Sync routines and progress into local storage
+ * Only changes since the last sync are transferred; returns the merged
+ * local state ({ token, routines, progress } keyed by id).
+ */
+export async function syncChanges() {
+  const token = localStorage.getItem("token");
+  if (!token) throw new Error("Not authenticated");
+
+  const { token: since } = loadSyncState();
+  const query = since ? `?since=${encodeURIComponent(since)}` : "";
+
+  const response = await fetch(`${API_BASE_URL}/sync${query}`, {
+    method: "GET",
+    headers: {
+      Authorization: `Bearer ${token}`,
+    },
+  });
+
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.detail || "Failed to sync");
+  }
+
+  return applySyncDelta(await response.json());
+}
+
+// ============================================================================
+// LIVE PRACTICE SESSION
+// ============================================================================
+
+/**
+ * Open a live practice session channel
+ * Pose events are buffered server-side and saved at pose boundaries,
+ * so progress survives a closed tab without one REST call per pose.
+ * Returns null when the user is not logged in.
+ */
+export function openPracticeSession(routineId = null) {
+  const token = localStorage.getItem("token");
+  if (!token) return null;
+
+  const wsUrl = API_BASE_URL.replace(/^http/, "ws");
+  const socket = new WebSocket(`${wsUrl}/ws/session?token=${encodeURIComponent(token)}`);
+  const queue = [];
+
+  function send(event) {
+    const message = JSON.stringify(event);
+    if (socket.readyState === WebSocket.OPEN) {
+      socket.send(message);
+    } else if (socket.readyState === WebSocket.CONNECTING) {
+      queue.push(message);
+    }
+  }
+
+  socket.addEventListener("open", () => {
+    while (queue.length > 0) {
+      socket.send(queue.shift());
+    }
+  });
+
+  return {
+    startPose(yogasanaId, yogasanaName) {
+      send({
+        type: "start",
+        routine_id: routineId,
+        yogasana_id: yogasanaId,
+        yogasana_name: yogasanaName,
+      });
+    },
+    finishPose(isCompleted = true, notes = null) {
+      send({ type: "finish", is_completed: isCompleted, notes });
+    },
+    end() {
+      send({ type: "end" });
+    },
+    close() {
+      socket.close();
+    },
+  };
+}
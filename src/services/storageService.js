@@ -1,4 +1,5 @@
 const STORAGE_KEY = 'wellness_routine';
+const SYNC_STORAGE_KEY = 'wellness_sync';
 
 function saveRoutine(routine) {
     routine.createdAt = new Date().toISOString();
@@ -14,4 +15,49 @@ function loadRoutine() {
     return JSON.parse(storedString);
 }
 
-export { saveRoutine, loadRoutine };
+function emptySyncState() {
+    return { token: null, routines: {}, progress: {} };
+}
+
+function loadSyncState() {
+    const storedString = localStorage.getItem(SYNC_STORAGE_KEY);
+    if (!storedString) {
+        return emptySyncState();
+    }
+    return JSON.parse(storedString);
+}
+
+// Merge a /sync response into the local copy: deletions first, then
+// created/updated rows by id (ids are never reused, repeats are harmless)
+function applySyncDelta(delta) {
+    const state = delta.full ? emptySyncState() : loadSyncState();
+
+    for (const routineId of delta.deleted_routines) {
+        delete state.routines[routineId];
+        for (const progressId of Object.keys(state.progress)) {
+            if (state.progress[progressId].routine_id === routineId) {
+                delete state.progress[progressId];
+            }
+        }
+    }
+    for (const progressId of delta.deleted_progress) {
+        delete state.progress[progressId];
+    }
+
+    for (const routine of delta.routines) {
+        state.routines[routine.id] = routine;
+    }
+    for (const progress of delta.progress) {
+        state.progress[progress.id] = progress;
+    }
+
+    state.token = delta.token;
+    localStorage.setItem(SYNC_STORAGE_KEY, JSON.stringify(state));
+    return state;
+}
+
+function clearSyncState() {
+    localStorage.removeItem(SYNC_STORAGE_KEY);
+}
+
+export { saveRoutine, loadRoutine, loadSyncState, applySyncDelta, clearSyncState };